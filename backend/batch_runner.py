@@ -0,0 +1,173 @@
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import matplotlib
+
+from backend.fetch_stock_data import fetch_stock_data
+from model_building.fast_model import predict_with_cascade
+from model_building.model_training_and_prediction import save_final_report
+from model_building.json_files import write_json, read_json
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BATCH_DIR = os.path.join(PROJECT_ROOT, 'results', 'batch')
+
+
+def read_watchlist(path):
+    """Read stock symbols from a watchlist file
+
+    Symbols may be separated by newlines, spaces or commas. Lines starting with
+    '#' are ignored and duplicates are dropped (keeping the first occurrence).
+    """
+    symbols = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            for symbol in line.replace(',', ' ').split():
+                symbol = symbol.strip().upper()
+                if symbol and symbol not in symbols:
+                    symbols.append(symbol)
+    if not symbols:
+        raise ValueError(f"No stock symbols found in watchlist {path}")
+    return symbols
+
+
+def checkpoint_path(run_dir, symbol):
+    return os.path.join(run_dir, 'checkpoints', f'{symbol}.json')
+
+
+def write_checkpoint(run_dir, symbol, result):
+    """Write a per-symbol result; the write is atomic, so a crash never leaves a partial file"""
+    write_json(checkpoint_path(run_dir, symbol), result, indent=None)
+
+
+def read_checkpoint(run_dir, symbol):
+    return read_json(checkpoint_path(run_dir, symbol))
+
+
+def process_chunk(symbols, run_dir, tier):
+    """Fetch and predict one chunk of symbols (runs in a worker process)"""
+    # Workers only save plots to files
+    matplotlib.use('Agg')
+    results = {}
+    try:
+        _, company_list, valid_symbols = fetch_stock_data(symbols)
+    except ValueError as e:
+        company_list, valid_symbols = [], []
+        print(f"Error fetching chunk {symbols[0]}..{symbols[-1]}: {str(e)}")
+
+    stock_data = dict(zip(valid_symbols, company_list))
+    for symbol in symbols:
+        try:
+            if symbol not in stock_data:
+                raise ValueError("No valid data available")
+            _, metrics = predict_with_cascade(symbol, stock_data=stock_data[symbol], tier=tier)
+            result = {
+                'symbol': symbol,
+                'status': 'ok',
+                'metrics': {name: value if isinstance(value, str) else float(value)
+                            for name, value in metrics.items()}
+            }
+        except Exception as e:
+            result = {'symbol': symbol, 'status': 'failed', 'error': str(e)}
+        write_checkpoint(run_dir, symbol, result)
+        results[symbol] = result
+    return results
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+def run_batch(symbols, run_dir, tier='auto', chunk_size=25, max_workers=None, retry_failed=False):
+    """Process a watchlist in parallel chunks, resuming from per-symbol checkpoints
+
+    Every finished symbol is checkpointed under run_dir/checkpoints, so running
+    the same batch again only processes the symbols that are still missing
+    (and the failed ones if retry_failed is set).
+    Per-symbol reports are written by the prediction functions; the aggregate
+    report is written once all chunks are done.
+    """
+    os.makedirs(os.path.join(run_dir, 'checkpoints'), exist_ok=True)
+    start_time = time.time()
+
+    results = {}
+    pending = []
+    for symbol in symbols:
+        checkpoint = read_checkpoint(run_dir, symbol)
+        if checkpoint is not None and not (retry_failed and checkpoint['status'] == 'failed'):
+            results[symbol] = checkpoint
+        else:
+            pending.append(symbol)
+
+    print(f"\nBatch run in {run_dir}")
+    print(f"{len(symbols)} symbols: {len(results)} already done, {len(pending)} to process")
+
+    if pending:
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        max_workers = max_workers or max(1, min(len(chunks), os.cpu_count() or 1))
+        # TensorFlow is not fork-safe, so workers are started fresh
+        context = multiprocessing.get_context('spawn')
+        done = 0
+
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = {executor.submit(process_chunk, chunk, run_dir, tier): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    # The worker died; symbols it did not checkpoint are retried on the next run
+                    print(f"Error processing chunk {chunk[0]}..{chunk[-1]}: {str(e)}")
+                done += len(chunk)
+
+                elapsed = time.time() - start_time
+                eta = elapsed / done * (len(pending) - done)
+                print(f"Progress: {done}/{len(pending)} symbols ({done / len(pending) * 100:.1f}%), "
+                      f"elapsed {format_duration(elapsed)}, ETA {format_duration(eta)}")
+
+    all_metrics = {symbol: result['metrics'] for symbol, result in results.items()
+                   if result['status'] == 'ok'}
+    failed = {symbol: result['error'] for symbol, result in results.items()
+              if result['status'] == 'failed'}
+    missing = [symbol for symbol in symbols if symbol not in results]
+
+    save_final_report(all_metrics, failed)
+    summary = {
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'symbols': len(symbols),
+        'succeeded': len(all_metrics),
+        'failed': failed,
+        'missing': missing,
+        'metrics': all_metrics
+    }
+    write_json(os.path.join(run_dir, 'summary.json'), summary)
+
+    print(f"\nBatch finished in {format_duration(time.time() - start_time)}: "
+          f"{len(all_metrics)} succeeded, {len(failed)} failed, {len(missing)} missing")
+    return summary
+
+
+def default_run_dir(watchlist_path, symbols, retry_failed=False):
+    """Run directory for a watchlist: its newest run if unfinished, otherwise a new one
+
+    Runs are named <watchlist>_<hash of its symbols>_<start time>. A crashed
+    nightly job therefore resumes when restarted, even after midnight, while a
+    finished run (or one over a changed watchlist) is never reused. With
+    retry_failed the newest run is reused even if it finished, so its failed
+    symbols can be reprocessed.
+    """
+    name = os.path.splitext(os.path.basename(watchlist_path))[0]
+    prefix = f"{name}_{hashlib.sha1(','.join(symbols).encode()).hexdigest()[:8]}_"
+    if os.path.isdir(BATCH_DIR):
+        runs = sorted(run for run in os.listdir(BATCH_DIR) if run.startswith(prefix))
+        if runs:
+            summary = read_json(os.path.join(BATCH_DIR, runs[-1], 'summary.json'))
+            if retry_failed or summary is None or summary['missing']:
+                return os.path.join(BATCH_DIR, runs[-1])
+    return os.path.join(BATCH_DIR, f"{prefix}{datetime.now().strftime('%Y%m%d-%H%M%S')}")
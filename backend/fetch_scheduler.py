@@ -0,0 +1,305 @@
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from model_building.file_locks import FCNTL_AVAILABLE, file_lock
+
+# Upstream request budget of the default scheduler, shared by all processes on the host
+FETCH_RATE_LIMIT = float(os.environ.get('FETCH_RATE_LIMIT', 5.0))
+FETCH_RATE_BURST = int(os.environ.get('FETCH_RATE_BURST', 10))
+FETCH_BUDGET_DIR = os.environ.get('FETCH_BUDGET_DIR', os.path.join(tempfile.gettempdir(), 'stock_fetch_budget'))
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit breaker is open and no cached data is available"""
+
+
+class YahooProvider:
+    """Market data from Yahoo Finance in the same layout as yf.download"""
+    name = 'yahoo'
+
+    def download(self, symbol, start, end):
+        # Ticker.history keeps no shared state between calls, unlike yf.download,
+        # so several symbols can be fetched concurrently
+        data = yf.Ticker(symbol).history(start=start, end=end, auto_adjust=False, actions=False)
+        if data.empty:
+            return data
+        if data.index.tz is not None:
+            data.index = data.index.tz_localize(None)
+        data.index.name = 'Date'
+        data.columns = pd.MultiIndex.from_product([data.columns, [symbol]], names=['Price', 'Ticker'])
+        return data
+
+
+class FakeProvider:
+    """Local provider with synthetic prices and injected latency and failures
+
+    Used to exercise the scheduler (and the API) without network access.
+    Prices are a deterministic random walk per symbol.
+    """
+    name = 'fake'
+
+    def __init__(self, latency=0.05, latency_jitter=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def download(self, symbol, start, end):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._rng.uniform(0, self.latency_jitter)
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError(f"Injected failure fetching {symbol}")
+
+        dates = pd.bdate_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), name='Date')
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        frame = pd.DataFrame({
+            'Adj Close': close,
+            'Close': close,
+            'High': close * 1.01,
+            'Low': close * 0.99,
+            'Open': close * (1 + rng.normal(0, 0.002, len(dates))),
+            'Volume': rng.integers(1_000_000, 5_000_000, len(dates)).astype(float)
+        }, index=dates)
+        frame.columns = pd.MultiIndex.from_product([frame.columns, [symbol]], names=['Price', 'Ticker'])
+        return frame
+
+
+class TokenBucket:
+    """Token bucket rate limiter: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """Token bucket whose budget is shared by all processes using the same state file
+
+    The token count lives in a small file that is updated under an exclusive
+    flock, so API workers and batch pool processes together stay within `rate`
+    requests per second instead of each getting a budget of its own.
+    """
+    _STATE = struct.Struct('dd')  # tokens, monotonic time of the last update
+
+    def __init__(self, rate, capacity, path):
+        self.rate = rate
+        self.capacity = capacity
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def acquire(self):
+        while True:
+            with file_lock(self.path) as fd:
+                now = time.monotonic()
+                raw = os.pread(fd, self._STATE.size, 0)
+                tokens, updated = self._STATE.unpack(raw) if len(raw) == self._STATE.size else (self.capacity, now)
+                # The monotonic clock restarts on reboot, so never trust an update from the future
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                if tokens >= 1:
+                    tokens -= 1
+                os.pwrite(fd, self._STATE.pack(tokens, now), 0)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+
+class AIMDLimiter:
+    """Adaptive concurrency limit (additive increase, multiplicative decrease)
+
+    The limit grows by about one slot per limit's worth of fast successful
+    calls, and is cut by `decrease` on an error or a call slower than
+    `latency_target` seconds.
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=32, latency_target=2.0, decrease=0.5):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency=None, error=False):
+        with self._condition:
+            self.in_flight -= 1
+            if error or (latency is not None and latency > self.latency_target):
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """Stops calling a provider after repeated failures
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are rejected for `reset_timeout` seconds. Then a single trial call is let
+    through (half-open); its success closes the circuit, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            return self.state == 'closed'
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class FetchScheduler:
+    """Schedules upstream market-data fetches for one provider
+
+    Every call goes through the provider's circuit breaker, the token bucket and
+    the adaptive concurrency limit, and failed calls are retried with jittered
+    exponential backoff. The last successful result per symbol is cached: a
+    fresh entry (same date range, younger than cache_ttl) is served without an
+    upstream call, and a stale one is served when the provider fails or its
+    circuit is open.
+
+    The token bucket is per scheduler unless a shared one (SharedTokenBucket) is
+    passed as `bucket`. The concurrency limit, breaker and cache are always per
+    process.
+    """
+
+    def __init__(self, provider=None, rate=5.0, burst=10, max_retries=3, base_delay=0.5,
+                 max_delay=8.0, cache_ttl=300.0, limiter=None, breaker=None, bucket=None):
+        self.provider = provider or YahooProvider()
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.limiter = limiter or AIMDLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def fetch(self, symbol, start, end):
+        """Fetch price data for a symbol, falling back to cached data on failure"""
+        date_range = (pd.Timestamp(start).date(), pd.Timestamp(end).date())
+        with self._cache_lock:
+            cached = self._cache.get(symbol)
+        if cached is not None and cached[1] == date_range and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[2]
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                last_error = CircuitOpenError(f"Circuit open for provider {self.provider.name}")
+                break
+
+            self.bucket.acquire()
+            self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                data = self.provider.download(symbol, start, end)
+            except Exception as e:
+                self.limiter.release(error=True)
+                self.breaker.record_failure()
+                last_error = e
+                if attempt < self.max_retries:
+                    # Full jitter: sleep a random time up to the exponential backoff
+                    backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+                    time.sleep(random.uniform(0, backoff))
+                continue
+
+            self.limiter.release(latency=time.monotonic() - started)
+            self.breaker.record_success()
+            with self._cache_lock:
+                self._cache[symbol] = (time.monotonic(), date_range, data)
+            return data
+
+        if cached is not None:
+            print(f"Warning: Serving cached data for {symbol} ({str(last_error)})")
+            return cached[2]
+        if isinstance(last_error, CircuitOpenError):
+            raise last_error
+        raise ConnectionError(f"Failed to fetch {symbol} after {self.max_retries + 1} attempts: {str(last_error)}")
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    """Process-wide scheduler in front of Yahoo Finance
+
+    Its request budget (FETCH_RATE_LIMIT per second, bursts of FETCH_RATE_BURST)
+    is shared by all processes on the host through a state file in
+    FETCH_BUDGET_DIR, so adding API workers or batch processes does not add
+    upstream traffic. Without flock support the budget is per process.
+    """
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            bucket = None
+            if FCNTL_AVAILABLE:
+                bucket = SharedTokenBucket(FETCH_RATE_LIMIT, FETCH_RATE_BURST,
+                                           os.path.join(FETCH_BUDGET_DIR, 'yahoo.bucket'))
+            _default_scheduler = FetchScheduler(YahooProvider(), rate=FETCH_RATE_LIMIT,
+                                                burst=FETCH_RATE_BURST, bucket=bucket)
+        return _default_scheduler
+
+
+def set_default_scheduler(scheduler):
+    """Replace the process-wide scheduler (e.g. with one using FakeProvider)"""
+    global _default_scheduler
+    with _default_lock:
+        _default_scheduler = scheduler
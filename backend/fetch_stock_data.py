@@ -1,22 +1,38 @@
-import yfinance as yf
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-def fetch_stock_data(stock_list):
+from backend.fetch_scheduler import get_default_scheduler
+
+def fetch_stock_data(stock_list, scheduler=None):
     """Get stock data for analysis"""
     # Set up End and Start times for data grab
     end = datetime.now()
     
     start = end - timedelta(days = 1*365)
     
+    # Upstream calls are rate limited, retried and circuit broken by the scheduler
+    scheduler = scheduler or get_default_scheduler()
+    
+    def download(symbol):
+        try:
+            print(f"\nFetching data for {symbol}...")
+            return scheduler.fetch(symbol, start, end), None
+        except Exception as e:
+            return None, e
+    
+    # The scheduler's adaptive limit decides how many of these actually run at once
+    with ThreadPoolExecutor(max_workers=max(1, min(len(stock_list), scheduler.limiter.max_limit))) as executor:
+        downloads = list(executor.map(download, stock_list))
+    
     # Get stock data
     company_list = []
     failed_downloads = []
     
-    for symbol in stock_list:
+    for symbol, (stock_data, error) in zip(stock_list, downloads):
         try:
-            print(f"\nFetching data for {symbol}...")
-            stock_data = yf.download(symbol, start=start, end=end, progress=False)
+            if error is not None:
+                raise error
             
             if stock_data.empty:
                 print(f"Warning: No data found for {symbol}")
@@ -36,6 +52,9 @@ def fetch_stock_data(stock_list):
                 failed_downloads.append((symbol, "Insufficient historical data"))
                 continue
             
+            # Work on a copy, the scheduler keeps the downloaded frame in its cache
+            stock_data = stock_data.copy()
+            
             # Handle NaN values
             if stock_data.isna().any().any():
                 print(f"Warning: Found NaN values in {symbol} data. Attempting to fill...")
@@ -1,3 +1,4 @@
+import argparse
 import time
 import sys
 import os
@@ -6,10 +7,11 @@ import matplotlib.pyplot as plt
 # Add parent directory to sys.path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from fetch_stock_datag import fetch_stock_data
+from backend.fetch_stock_data import fetch_stock_data
+from backend.batch_runner import read_watchlist, run_batch, default_run_dir
 from model_building.data_analysis_and_visualization import main_analysis, plot_correlation_analysis
 from model_building.risk_analysis import analyze_risk
-from model_building.model_training_and_prediction import predict_stock_price, generate_report, generate_final_report
+from model_building.model_training_and_prediction import predict_stock_price, save_final_report
 
 def get_valid_stock_symbols():
     """Get valid stock symbols from user input"""
@@ -25,8 +27,34 @@ def get_valid_stock_symbols():
             continue
         return stock_list
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Stock analysis and price prediction')
+    parser.add_argument('--watchlist', help='Run headless over the symbols in this file instead of asking for input')
+    parser.add_argument('--run-dir', help='Checkpoint directory of the batch run (default: resume the newest unfinished run of the watchlist)')
+    parser.add_argument('--tier', choices=['auto', 'fast', 'lstm'], default='auto',
+                        help='Prediction model tier used in batch mode')
+    parser.add_argument('--chunk-size', type=int, default=25, help='Symbols per worker task in batch mode')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes in batch mode')
+    parser.add_argument('--retry-failed', action='store_true', help='Reprocess the symbols that failed in the newest run of the watchlist')
+    return parser.parse_args()
+
+def run_watchlist(args):
+    """Headless batch run over a watchlist file"""
+    stock_list = read_watchlist(args.watchlist)
+    run_dir = args.run_dir or default_run_dir(args.watchlist, stock_list, args.retry_failed)
+    run_batch(stock_list, run_dir, tier=args.tier, chunk_size=args.chunk_size,
+              max_workers=args.workers, retry_failed=args.retry_failed)
+    print("\nIndividual stock reports are saved as [SYMBOL]_prediction_report.txt in the results directory")
+    print("A comprehensive final report has been saved as final_model_report.txt")
+
 def main():
     """Main function to run the analysis"""
+    args = parse_args()
+    if args.watchlist:
+        run_watchlist(args)
+        return
+    
     start_time = time.time()
     
     # Ask user for stock names with validation
@@ -39,7 +67,7 @@ def main():
     main_analysis(company_list, stock_list)
     
     # Correlation analysis
-    tech_rets = plot_correlation_analysis(stock_list)
+    tech_rets = plot_correlation_analysis(stock_list, company_list)
     
     # Risk analysis
     analyze_risk(tech_rets)
@@ -47,16 +75,15 @@ def main():
     # Dictionary to store metrics for all stocks
     all_metrics = {}
     
-    # Predict stock prices for each symbol and generate report
+    # Predict stock prices for each symbol (the report is saved by predict_stock_price)
     for symbol in stock_list:
         predictions, metrics = predict_stock_price(symbol)
         print(f"\nPredicted vs Actual Prices for {symbol}:")
         print(predictions.tail(30))  # Show last 30 days
-        generate_report(symbol, predictions, metrics)
         all_metrics[symbol] = metrics
     
     # Generate final comprehensive report
-    generate_final_report(all_metrics)
+    save_final_report(all_metrics)
     
     end_time = time.time()
     execution_time = end_time - start_time
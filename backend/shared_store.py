@@ -0,0 +1,289 @@
+import hashlib
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, ExitStack
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+import pandas as pd
+
+from model_building.json_files import write_json, read_json
+from model_building.file_locks import file_lock
+
+DEFAULT_STORE_DIR = os.path.join(tempfile.gettempdir(), 'stock_shared_store')
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = 'manifest.lock'
+SHM_DIR = '/dev/shm'
+# Python 3.13 can open segments untracked; older versions unregister them after opening
+SHM_TRACK_ARG = sys.version_info >= (3, 13)
+
+# Detached handles whose arrays may still be in use. Closing a handle fails with
+# BufferError while any view of its arrays lives, so they are kept here (not left
+# to SharedMemory.__del__) and retried on later calls of any store in the process.
+_retired_segments = []
+_retired_lock = threading.Lock()
+
+
+class SharedArrayStore:
+    """Versioned store of numpy arrays in shared memory, shared between worker processes.
+
+    Any process can publish: it copies the arrays into a fresh shared memory segment
+    and then swaps the manifest entry to point at it, holding a short lock on the
+    manifest. Readers attach to the segment named in the manifest and get read-only,
+    zero-copy views, so they never see a half-written version. refresh_lock() lets
+    one process at a time refresh a key, so workers missing the same key do not all
+    fetch it.
+
+    Segments belong to the manifest, not to the process that created them: the
+    publisher of a new version unlinks versions older than keep_versions, and
+    segments left unreferenced by a crashed publisher are removed on the next publish.
+    """
+
+    def __init__(self, store_dir=None, keep_versions=2):
+        self.store_dir = store_dir or os.environ.get('SHARED_STORE_DIR', DEFAULT_STORE_DIR)
+        self.keep_versions = max(keep_versions, 1)
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.manifest_path = os.path.join(self.store_dir, MANIFEST_FILE)
+        self.lock_path = os.path.join(self.store_dir, LOCK_FILE)
+        # Segment names carry a per-store prefix, so garbage collection only touches this store
+        store_id = hashlib.sha1(os.path.abspath(self.store_dir).encode()).hexdigest()[:8]
+        self.segment_prefix = f"sps_{store_id}_"
+        self._lock = threading.RLock()
+        self._attached = {}  # key -> (version, SharedMemory, arrays, entry)
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+    @contextmanager
+    def refresh_lock(self, keys):
+        """Hold the refresh locks of keys, so one process (or thread) at a time refreshes a key"""
+        with ExitStack() as stack:
+            # Always lock in the same order to avoid deadlocks between overlapping key sets
+            for key in sorted(set(keys)):
+                digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+                stack.enter_context(file_lock(os.path.join(self.store_dir, f'refresh_{digest}.lock')))
+            yield
+
+    def publish_arrays(self, key, arrays, attrs=None):
+        """Publish a list of arrays under key as a new version"""
+        arrays = [np.ascontiguousarray(array) for array in arrays]
+        layout = []
+        offset = 0
+        for array in arrays:
+            # Keep every array 8-byte aligned inside the segment
+            offset = (offset + 7) // 8 * 8
+            layout.append({
+                'offset': offset,
+                'shape': list(array.shape),
+                'dtype': array.dtype.str
+            })
+            offset += array.nbytes
+
+        # Segments are only created under the manifest lock, so garbage collection
+        # never removes a segment that is about to be published
+        with self._lock, file_lock(self.lock_path):
+            name = f"{self.segment_prefix}{secrets.token_hex(6)}"
+            shm = self._open_segment(name, size=max(offset, 1))
+            try:
+                for array, spec in zip(arrays, layout):
+                    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=spec['offset'])[...] = array
+            except Exception:
+                self._unlink_segment(name)
+                raise
+            finally:
+                shm.close()
+
+            manifest = self._read_manifest()
+            previous = manifest.get(key)
+            version = previous['version'] + 1 if previous else 1
+            older = [previous['segment']] + previous.get('previous', []) if previous else []
+            manifest[key] = {
+                'version': version,
+                'segment': name,
+                'previous': older[:self.keep_versions - 1],
+                'arrays': layout,
+                'attrs': attrs or {},
+                'published_at': time.time()
+            }
+            self._write_manifest(manifest)
+
+            # Drop versions older than keep_versions; attached readers keep their mappings
+            for old in older[self.keep_versions - 1:]:
+                self._unlink_segment(old)
+            self._collect_garbage(manifest)
+
+        return version
+
+    def publish_frame(self, key, frame):
+        """Publish a numeric DataFrame with a datetime index"""
+        columns = frame.columns
+        is_multi = isinstance(columns, pd.MultiIndex)
+        index = pd.DatetimeIndex(frame.index)
+        attrs = {
+            'kind': 'frame',
+            'columns': [list(c) for c in columns] if is_multi else list(columns),
+            'multi_columns': is_multi,
+            'index_name': frame.index.name,
+            'tz': str(index.tz) if index.tz is not None else None
+        }
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        index_values = index.values.astype('datetime64[ns]').view('int64')
+        values = frame.to_numpy(dtype=np.float64)
+        return self.publish_arrays(key, [index_values, values], attrs)
+
+    def publish_weights(self, key, weights):
+        """Publish a list of model weight arrays (e.g. from model.get_weights())"""
+        return self.publish_arrays(key, weights, {'kind': 'weights'})
+
+    def close(self):
+        """Detach from all segments; published segments stay available to other processes"""
+        with self._lock:
+            retired = [shm for _, shm, _, _ in self._attached.values()]
+            self._attached.clear()
+            _close_retired(retired)
+
+    def destroy(self):
+        """Unlink every segment of the store and remove its directory
+
+        For stores owned by a single run (e.g. a load test). Views already handed
+        out stay valid, but the store can no longer be read by any process.
+        """
+        with self._lock, file_lock(self.lock_path):
+            self.close()
+            for entry in self._read_manifest().values():
+                for name in [entry['segment']] + entry.get('previous', []):
+                    self._unlink_segment(name)
+            # Also catches segments left unreferenced by a crashed publisher
+            self._collect_garbage({})
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Reader side
+    # ------------------------------------------------------------------
+    def read_arrays(self, key, max_age=None):
+        """Return (arrays, attrs) for the latest version of key, or None if unavailable"""
+        with self._lock:
+            for _ in range(2):
+                entry = self._read_manifest().get(key)
+                if entry is None:
+                    return None
+                if max_age is not None and time.time() - entry['published_at'] > max_age:
+                    return None
+
+                cached = self._attached.get(key)
+                if cached is not None and cached[0] == entry['version']:
+                    return cached[2], cached[3]['attrs']
+
+                try:
+                    shm = self._open_segment(entry['segment'])
+                except FileNotFoundError:
+                    # A publisher swapped versions between reading the manifest and attaching
+                    continue
+
+                # np.frombuffer keeps a buffer export on the segment for as long as any view of
+                # the array lives, so closing the segment fails with BufferError instead of
+                # unmapping memory still in use (np.ndarray(buffer=...) takes no export)
+                arrays = []
+                for spec in entry['arrays']:
+                    shape = tuple(spec['shape'])
+                    array = np.frombuffer(shm.buf, dtype=np.dtype(spec['dtype']),
+                                          count=int(np.prod(shape)), offset=spec['offset']).reshape(shape)
+                    array.flags.writeable = False
+                    arrays.append(array)
+
+                self._attached[key] = (entry['version'], shm, arrays, entry)
+                _close_retired([cached[1]] if cached is not None else [])
+                return arrays, entry['attrs']
+            return None
+
+    def read_frame(self, key, max_age=None):
+        """Return a read-only DataFrame view of a published frame, or None"""
+        result = self.read_arrays(key, max_age=max_age)
+        if result is None:
+            return None
+        (index_values, values), attrs = result
+        index = pd.DatetimeIndex(index_values.view('datetime64[ns]'), name=attrs.get('index_name'))
+        if attrs.get('tz'):
+            index = index.tz_localize('UTC').tz_convert(attrs['tz'])
+        if attrs.get('multi_columns'):
+            columns = pd.MultiIndex.from_tuples([tuple(c) for c in attrs['columns']])
+        else:
+            columns = attrs['columns']
+        return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+    def read_weights(self, key, max_age=None):
+        """Return the list of published weight arrays, or None"""
+        result = self.read_arrays(key, max_age=max_age)
+        return None if result is None else result[0]
+
+    def version(self, key):
+        """Return the latest published version of key (0 if never published)"""
+        return self._read_manifest().get(key, {}).get('version', 0)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _read_manifest(self):
+        return read_json(self.manifest_path) or {}
+
+    def _write_manifest(self, manifest):
+        # The write is atomic, so readers see either the old or the new manifest
+        write_json(self.manifest_path, manifest, indent=None)
+
+    def _open_segment(self, name, size=None):
+        # Segments are never registered with the resource tracker, otherwise they
+        # would be unlinked as soon as the process that created or attached them exits
+        create = size is not None
+        if SHM_TRACK_ARG:
+            return shared_memory.SharedMemory(name=name, create=create, size=size or 0, track=False)
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size or 0)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+    def _unlink_segment(self, name):
+        try:
+            shm = self._open_segment(name)
+        except FileNotFoundError:
+            return
+        if not SHM_TRACK_ARG:
+            # unlink() unregisters the segment, so it has to be registered again first
+            resource_tracker.register(shm._name, 'shared_memory')
+        shm.unlink()
+        shm.close()
+
+    def _collect_garbage(self, manifest):
+        """Unlink segments of this store that the manifest no longer references"""
+        if not os.path.isdir(SHM_DIR):
+            return
+        referenced = set()
+        for entry in manifest.values():
+            referenced.add(entry['segment'])
+            referenced.update(entry.get('previous', []))
+        for name in os.listdir(SHM_DIR):
+            if name.startswith(self.segment_prefix) and name not in referenced:
+                self._unlink_segment(name)
+
+
+def _close_retired(handles):
+    """Close detached handles, keeping those whose arrays are still in use for a later retry"""
+    global _retired_segments
+    with _retired_lock:
+        still_referenced = []
+        for shm in _retired_segments + list(handles):
+            try:
+                shm.close()
+            except BufferError:
+                still_referenced.append(shm)
+        _retired_segments = still_referenced
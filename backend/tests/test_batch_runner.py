@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend import batch_runner
+from backend.fetch_scheduler import FakeProvider, FetchScheduler, get_default_scheduler, set_default_scheduler
+
+SYMBOLS = ['AAA', 'BBB', 'CCC']
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    """Batch runs over FakeProvider prices, in threads, with a stub model that fails for `failing`"""
+    state = {'failing': set(), 'predicted': []}
+
+    def predict(symbol, stock_data=None, tier='auto'):
+        state['predicted'].append(symbol)
+        if symbol in state['failing']:
+            raise ValueError(f"Model failed for {symbol}")
+        return None, {'rmse': 1.0, 'normalized_rmse': 1.0, 'model_tier': 'fast'}
+
+    monkeypatch.setattr(batch_runner, 'BATCH_DIR', str(tmp_path / 'batch'))
+    monkeypatch.setattr(batch_runner, 'ProcessPoolExecutor',
+                        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    monkeypatch.setattr(batch_runner, 'predict_with_cascade', predict)
+    monkeypatch.setattr(batch_runner, 'save_final_report', lambda all_metrics, failed: None)
+
+    previous = get_default_scheduler()
+    set_default_scheduler(FetchScheduler(FakeProvider(latency=0), rate=1000.0, burst=1000,
+                                         base_delay=0.0, max_delay=0.0))
+    yield state
+    set_default_scheduler(previous)
+
+
+def run(state, retry_failed=False):
+    run_dir = batch_runner.default_run_dir('watchlist.txt', SYMBOLS, retry_failed)
+    state['predicted'].clear()
+    return run_dir, batch_runner.run_batch(SYMBOLS, run_dir, chunk_size=2, retry_failed=retry_failed)
+
+
+def test_finished_run_is_not_reused(batch):
+    first_dir, summary = run(batch)
+    assert summary['succeeded'] == 3
+    assert sorted(batch['predicted']) == SYMBOLS
+
+    # Run directories are named by start time, make the finished run an older one
+    older_dir = first_dir[:-len('YYYYmmdd-HHMMSS')] + '20240101-000000'
+    os.rename(first_dir, older_dir)
+    assert batch_runner.default_run_dir('watchlist.txt', SYMBOLS) != older_dir
+    assert batch_runner.default_run_dir('watchlist.txt', SYMBOLS, retry_failed=True) == older_dir
+
+
+def test_unfinished_run_resumes_from_checkpoints(batch):
+    run_dir = batch_runner.default_run_dir('watchlist.txt', SYMBOLS)
+    batch_runner.write_checkpoint(run_dir, 'AAA', {'symbol': 'AAA', 'status': 'ok', 'metrics': {'rmse': 2.0}})
+
+    resumed_dir, summary = run(batch)
+    assert resumed_dir == run_dir
+    assert sorted(batch['predicted']) == ['BBB', 'CCC']
+    assert summary['metrics']['AAA'] == {'rmse': 2.0}
+
+
+def test_retry_failed_reprocesses_failures_of_the_newest_run(batch):
+    batch['failing'] = {'BBB'}
+    first_dir, summary = run(batch)
+    assert list(summary['failed']) == ['BBB']
+    assert not summary['missing']
+
+    batch['failing'] = set()
+    retry_dir, summary = run(batch, retry_failed=True)
+    assert retry_dir == first_dir
+    assert batch['predicted'] == ['BBB']
+    assert summary['succeeded'] == 3 and not summary['failed']
@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.fetch_scheduler import (
+    AIMDLimiter, CircuitBreaker, CircuitOpenError, FakeProvider, FetchScheduler,
+    SharedTokenBucket, TokenBucket
+)
+
+END = datetime(2024, 6, 28)
+START = END - timedelta(days=365)
+
+
+def make_scheduler(provider, **kwargs):
+    """Scheduler without backoff sleeps or rate limiting, unless a test asks for them"""
+    options = {'rate': 1000.0, 'burst': 1000, 'base_delay': 0.0, 'max_delay': 0.0}
+    options.update(kwargs)
+    return FetchScheduler(provider, **options)
+
+
+def test_fetch_returns_provider_data():
+    provider = FakeProvider(latency=0)
+    data = make_scheduler(provider).fetch('AAPL', START, END)
+
+    assert not data.empty
+    assert ('Adj Close', 'AAPL') in data.columns
+    assert provider.calls == 1
+
+
+def test_failed_fetch_is_retried_max_retries_times():
+    provider = FakeProvider(latency=0, failure_rate=1.0)
+    scheduler = make_scheduler(provider, max_retries=3, breaker=CircuitBreaker(failure_threshold=100))
+
+    with pytest.raises(ConnectionError, match='after 4 attempts'):
+        scheduler.fetch('AAPL', START, END)
+    assert provider.calls == 4
+
+
+def test_breaker_opens_and_rejects_calls():
+    provider = FakeProvider(latency=0, failure_rate=1.0)
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    scheduler = make_scheduler(provider, max_retries=5, breaker=breaker)
+
+    with pytest.raises(CircuitOpenError):
+        scheduler.fetch('AAPL', START, END)
+    assert breaker.state == 'open'
+    assert provider.calls == 3
+
+    # While open, calls are rejected without reaching the provider
+    with pytest.raises(CircuitOpenError):
+        scheduler.fetch('MSFT', START, END)
+    assert provider.calls == 3
+
+
+def test_half_open_trial_closes_or_reopens_breaker():
+    provider = FakeProvider(latency=0, failure_rate=1.0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    scheduler = make_scheduler(provider, max_retries=0, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            scheduler.fetch('AAPL', START, END)
+    assert breaker.state == 'open'
+
+    # A failed half-open trial reopens the circuit after a single call
+    time.sleep(0.06)
+    with pytest.raises(ConnectionError):
+        scheduler.fetch('AAPL', START, END)
+    assert breaker.state == 'open'
+    assert provider.calls == 3
+
+    # A successful trial closes it again
+    time.sleep(0.06)
+    provider.failure_rate = 0.0
+    scheduler.fetch('AAPL', START, END)
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+
+
+def test_fresh_cache_entry_skips_provider():
+    provider = FakeProvider(latency=0)
+    scheduler = make_scheduler(provider, cache_ttl=60)
+
+    first = scheduler.fetch('AAPL', START, END)
+    second = scheduler.fetch('AAPL', START, END)
+    assert second is first
+    assert provider.calls == 1
+
+
+def test_stale_cache_is_served_when_provider_fails():
+    provider = FakeProvider(latency=0)
+    scheduler = make_scheduler(provider, cache_ttl=0, max_retries=1)
+    cached = scheduler.fetch('AAPL', START, END)
+
+    provider.failure_rate = 1.0
+    assert scheduler.fetch('AAPL', START, END) is cached
+    assert provider.calls == 3
+
+
+def test_stale_cache_is_served_when_circuit_is_open():
+    provider = FakeProvider(latency=0)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    scheduler = make_scheduler(provider, cache_ttl=0, max_retries=0, breaker=breaker)
+    cached = scheduler.fetch('AAPL', START, END)
+
+    provider.failure_rate = 1.0
+    with pytest.raises(ConnectionError):
+        scheduler.fetch('MSFT', START, END)
+    assert breaker.state == 'open'
+    assert scheduler.fetch('AAPL', START, END) is cached
+
+
+def test_token_bucket_paces_requests_after_burst():
+    bucket = TokenBucket(rate=20, capacity=2)
+    started = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # Two requests use the burst, the other four wait 1/20 s each
+    assert time.monotonic() - started >= 4 / 20 * 0.9
+
+
+def _drain_shared_bucket(path, count):
+    bucket = SharedTokenBucket(rate=20, capacity=2, path=path)
+    for _ in range(count):
+        bucket.acquire()
+
+
+def test_shared_token_bucket_budget_spans_processes(tmp_path):
+    path = os.path.join(tmp_path, 'test.bucket')
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_drain_shared_bucket, args=(path, 5)) for _ in range(2)]
+
+    started = time.monotonic()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+    # 10 requests against one budget of 20/s with a burst of 2
+    assert time.monotonic() - started >= 8 / 20 * 0.9
+
+
+def test_aimd_limit_drops_on_errors_and_slow_calls():
+    limiter = AIMDLimiter(initial=8, min_limit=1, latency_target=1.0, decrease=0.5)
+
+    limiter.acquire()
+    limiter.release(error=True)
+    assert limiter.limit == 4
+
+    limiter.acquire()
+    limiter.release(latency=2.0)
+    assert limiter.limit == 2
+
+    limiter.acquire()
+    limiter.release(latency=0.1)
+    assert limiter.limit == pytest.approx(2.5)
+
+
+def test_scheduler_errors_reduce_concurrency_limit():
+    provider = FakeProvider(latency=0, failure_rate=1.0)
+    limiter = AIMDLimiter(initial=8)
+    scheduler = make_scheduler(provider, max_retries=2, limiter=limiter,
+                               breaker=CircuitBreaker(failure_threshold=100))
+
+    with pytest.raises(ConnectionError):
+        scheduler.fetch('AAPL', START, END)
+    assert limiter.limit == 1
+    assert limiter.in_flight == 0
@@ -0,0 +1,132 @@
+import gc
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.shared_store import SharedArrayStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedArrayStore(str(tmp_path / 'store'))
+    yield store
+    store.destroy()
+
+
+def _read_sum(store_dir, key, queue):
+    store = SharedArrayStore(store_dir)
+    arrays, attrs = store.read_arrays(key)
+    queue.put((float(arrays[0].sum()), attrs))
+    store.close()
+
+
+def _swap_while_holding_view(store_dir, queue):
+    reader = SharedArrayStore(store_dir)
+    writer = SharedArrayStore(store_dir)
+    writer.publish_arrays('k', [np.arange(1000, dtype=np.float64)])
+    old = reader.read_arrays('k')[0][0][10:20]
+
+    writer.publish_arrays('k', [np.zeros(1000)])
+    writer.publish_arrays('k', [np.ones(1000)])
+    new = reader.read_arrays('k')[0][0]
+    gc.collect()
+
+    # Touching the old view after the swap used to read unmapped memory
+    queue.put((float(old.sum()), float(new.sum())))
+    del old
+    reader.close()
+    writer.close()
+
+
+def test_publish_and_read_arrays_round_trip(store):
+    index = np.arange(5, dtype=np.int64)
+    values = np.linspace(0, 1, 10).reshape(5, 2)
+    version = store.publish_arrays('k', [index, values], {'kind': 'test'})
+
+    arrays, attrs = store.read_arrays('k')
+    assert version == store.version('k') == 1
+    assert attrs == {'kind': 'test'}
+    np.testing.assert_array_equal(arrays[0], index)
+    np.testing.assert_array_equal(arrays[1], values)
+    assert not arrays[1].flags.writeable
+
+
+def test_publish_and_read_frame_round_trip(store):
+    dates = pd.bdate_range('2024-01-01', periods=4, name='Date', unit='ns')
+    columns = pd.MultiIndex.from_product([['Close', 'Volume'], ['AAPL']], names=['Price', 'Ticker'])
+    frame = pd.DataFrame(np.arange(8, dtype=float).reshape(4, 2), index=dates, columns=columns)
+    store.publish_frame('AAPL', frame)
+
+    pd.testing.assert_frame_equal(store.read_frame('AAPL'), frame, check_names=False, check_freq=False)
+
+
+def test_missing_or_expired_key_reads_none(store):
+    assert store.read_arrays('missing') is None
+    store.publish_arrays('k', [np.ones(3)])
+    assert store.read_arrays('k', max_age=-1) is None
+
+
+def test_version_swap_keeps_old_views_valid(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_swap_while_holding_view, args=(str(tmp_path / 'store'), queue))
+    process.start()
+    process.join(timeout=60)
+
+    SharedArrayStore(str(tmp_path / 'store')).destroy()
+    assert process.exitcode == 0
+    assert queue.get(timeout=5) == (sum(range(10, 20)), 1000.0)
+
+
+def test_old_view_survives_swap_in_process(store):
+    other = SharedArrayStore(store.store_dir)
+    other.publish_arrays('k', [np.full(100, 2.0)])
+    old = store.read_arrays('k')[0][0]
+
+    other.publish_arrays('k', [np.full(100, 3.0)])
+    other.publish_arrays('k', [np.full(100, 4.0)])
+    assert store.read_arrays('k')[0][0][0] == 4.0
+    assert old.sum() == 200.0
+    other.close()
+
+
+def test_cross_process_read(store):
+    store.publish_arrays('k', [np.arange(10, dtype=np.float64)], {'source': 'parent'})
+
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_read_sum, args=(store.store_dir, 'k', queue))
+    process.start()
+    process.join(timeout=60)
+
+    assert process.exitcode == 0
+    assert queue.get(timeout=5) == (45.0, {'source': 'parent'})
+
+
+def test_old_versions_are_unlinked(store):
+    for value in range(4):
+        store.publish_arrays('k', [np.full(10, float(value))])
+
+    entry = store._read_manifest()['k']
+    assert entry['version'] == 4
+    assert len(entry['previous']) == store.keep_versions - 1
+
+
+def test_destroy_unlinks_all_segments(tmp_path):
+    store = SharedArrayStore(str(tmp_path / 'store'))
+    for value in range(3):
+        store.publish_arrays('a', [np.full(10, float(value))])
+    store.publish_arrays('b', [np.ones(10)])
+    view = store.read_arrays('a')[0][0]
+    segments = [name for entry in store._read_manifest().values()
+                for name in [entry['segment']] + entry['previous']]
+
+    store.destroy()
+    assert not os.path.exists(store.store_dir)
+    for name in segments:
+        with pytest.raises(FileNotFoundError):
+            store._open_segment(name)
+    assert view.sum() == 20.0
@@ -7,6 +7,7 @@ import numpy as np
 import matplotlib
 import shutil
 import mimetypes
+import threading
 matplotlib.use('Agg')
 
 # Get absolute paths
@@ -19,12 +20,18 @@ API_RESULTS_DIR = os.path.join(CURRENT_DIR, 'results')
 sys.path.insert(0, PROJECT_ROOT)
 
 from backend.fetch_stock_data import fetch_stock_data
-from model_building.model_training_and_prediction import predict_stock_price
+from backend.shared_store import SharedArrayStore
+from model_building.fast_model import predict_with_cascade, MODEL_TIERS
 from model_building.data_analysis_and_visualization import main_analysis
+from model_building.backtesting import run_backtest, backtest_job_id, get_backtest_status, is_backtest_running
 
 app = Flask(__name__)
 CORS(app)
 
+# Price panels are shared between worker processes; the first worker to miss a panel refreshes it for all
+PRICE_PANEL_TTL = int(os.environ.get('PRICE_PANEL_TTL', 15 * 60))
+PRICE_STORE = SharedArrayStore()
+
 def get_mime_type(filename):
     """Get MIME type based on file extension"""
     if filename.endswith('.pdf'):
@@ -51,6 +58,51 @@ def copy_results():
     except Exception as e:
         print(f"Error copying results: {str(e)}")
 
+def load_price_panels(symbols):
+    """Get price panels from the shared store, fetching and publishing stale ones"""
+    panels = {}
+    missing = []
+    for symbol in symbols:
+        panel = PRICE_STORE.read_frame(symbol, max_age=PRICE_PANEL_TTL)
+        if panel is None:
+            missing.append(symbol)
+        else:
+            panels[symbol] = panel
+    
+    if missing:
+        # One worker at a time refreshes a symbol; the others wait and then read what it published
+        with PRICE_STORE.refresh_lock(missing):
+            stale = []
+            for symbol in missing:
+                panel = PRICE_STORE.read_frame(symbol, max_age=PRICE_PANEL_TTL)
+                if panel is None:
+                    stale.append(symbol)
+                else:
+                    panels[symbol] = panel
+            
+            if stale:
+                print(f"Shared store miss for: {', '.join(stale)}")
+                try:
+                    _, fetched_list, fetched_symbols = fetch_stock_data(stale)
+                except ValueError:
+                    if not panels:
+                        raise
+                    fetched_list, fetched_symbols = [], []
+                
+                for symbol, stock_data in zip(fetched_symbols, fetched_list):
+                    PRICE_STORE.publish_frame(symbol, stock_data.drop(columns=['company_name']))
+                    panels[symbol] = PRICE_STORE.read_frame(symbol)
+    
+    valid_symbols = [symbol for symbol in symbols if symbol in panels]
+    # Analysis adds columns to each frame, so it gets its own copies
+    company_list = [panels[symbol].copy().assign(company_name=symbol) for symbol in valid_symbols]
+    return panels, company_list, valid_symbols
+
+@app.route('/api/health')
+def health():
+    """Liveness check for load balancers and the load-test harness"""
+    return jsonify({'status': 'ok'})
+
 @app.route('/api/results/<path:filename>')
 def serve_result_file(filename):
     """Serve result files with forced download"""
@@ -114,16 +166,21 @@ def predict():
     try:
         data = request.get_json()
         symbols = data.get('symbols', [])
+        # 'auto' serves the fast lag-feature model and escalates to the LSTM when needed
+        model_tier = data.get('model_tier', 'auto')
         
         if not symbols:
             return jsonify({'error': 'No stock symbols provided'}), 400
+        
+        if model_tier not in MODEL_TIERS:
+            return jsonify({'error': f"Unknown model tier: {model_tier}"}), 400
 
         print(f"\nProcessing request for symbols: {', '.join(symbols)}")
         
         # Get stock data
         try:
             print("\nFetching stock data...")
-            df, company_list, valid_symbols = fetch_stock_data(symbols)
+            panels, company_list, valid_symbols = load_price_panels(symbols)
             
             if not valid_symbols:
                 return jsonify({
@@ -179,7 +236,8 @@ def predict():
                     raise ValueError("Failed to retrieve stock data")
                 
                 print(f"\nProcessing predictions for {symbol}...")
-                predictions_df, symbol_metrics = predict_stock_price(symbol)
+                predictions_df, symbol_metrics = predict_with_cascade(
+                    symbol, stock_data=panels[symbol], tier=model_tier)
                 
                 if predictions_df is not None and not predictions_df.empty:
                     print(f"Successfully generated predictions for {symbol}")
@@ -200,7 +258,8 @@ def predict():
                         'normalized_rmse': float(symbol_metrics['normalized_rmse']),
                         'mae': float(symbol_metrics['mae']),
                         'r2': float(symbol_metrics['r2']),
-                        'directional_accuracy': float(symbol_metrics['directional_accuracy'])
+                        'directional_accuracy': float(symbol_metrics['directional_accuracy']),
+                        'model_tier': symbol_metrics['model_tier']
                     }
                     
                     # Add technical analysis
@@ -246,5 +305,55 @@ def predict():
             'details': str(e)
         }), 500
 
+@app.route('/api/backtest', methods=['POST'])
+def start_backtest():
+    """Start a walk-forward backtest job in the background"""
+    try:
+        data = request.get_json() or {}
+        symbols = data.get('symbols', [])
+        
+        if not symbols:
+            return jsonify({'error': 'No stock symbols provided'}), 400
+        
+        params = {
+            'n_folds': int(data.get('folds', 5)),
+            'mode': data.get('mode', 'expanding'),
+            'sequence_length': int(data['sequence_length']) if data.get('sequence_length') else None,
+            'days': int(data.get('days', 3*365)),
+            'epochs': int(data.get('epochs', 100))
+        }
+        if params['mode'] not in ('expanding', 'rolling'):
+            return jsonify({'error': f"Unknown mode: {params['mode']}"}), 400
+        
+        job_id = backtest_job_id(symbols, **params)
+        status = get_backtest_status(job_id)
+        if is_backtest_running(job_id) or (status is not None and status['status'] != 'running'):
+            return jsonify({'job_id': job_id, 'status': status['status'] if status else 'running'}), 202
+        
+        # New job, or one left 'running' by a process that died: it resumes from its checkpoints.
+        # If another worker starts it at the same moment, run_backtest's job lock lets only one run.
+        def run_job():
+            try:
+                run_backtest(symbols, job_id=job_id, **params)
+            except Exception as e:
+                print(f"Error in backtest job {job_id}: {str(e)}")
+        
+        threading.Thread(target=run_job, daemon=True).start()
+        return jsonify({'job_id': job_id, 'status': 'running'}), 202
+    
+    except Exception as e:
+        return jsonify({
+            'error': 'Error starting backtest',
+            'details': str(e)
+        }), 500
+
+@app.route('/api/backtest/<job_id>')
+def backtest_status(job_id):
+    """Get status and aggregated metrics of a backtest job"""
+    status = get_backtest_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Backtest job not found'}), 404
+    return jsonify(status)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
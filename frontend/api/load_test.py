@@ -0,0 +1,349 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+# Optional import for per-worker resource sampling; /proc is used as a fallback on Linux
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..', '..'))
+
+
+def stub_predict(symbol, stock_data=None, tier='auto'):
+    """Stand-in for the model cascade: predicts yesterday's close, no training"""
+    from model_building.model_training_and_prediction import load_price_data, calculate_metrics
+
+    data = load_price_data(symbol, stock_data)
+    valid = data.tail(60).copy()
+    valid['Predictions'] = valid['Close'].shift(1).bfill()
+    metrics = calculate_metrics(valid[['Close']].values, valid[['Predictions']].values)
+    metrics['final_loss'] = 0.0
+    metrics['model_tier'] = 'stub'
+    return valid, metrics
+
+
+def serve(port, options):
+    """Run one app worker with a stubbed data provider (runs in a child process)"""
+    os.environ['SHARED_STORE_DIR'] = options['store_dir']
+    # main_analysis writes to results/ relative to the working directory, so
+    # plots go to the run's work dir instead of the repository
+    os.chdir(options['work_dir'])
+    sys.path.insert(0, CURRENT_DIR)
+    sys.path.insert(0, PROJECT_ROOT)
+
+    from werkzeug.serving import make_server
+    from backend.fetch_scheduler import FakeProvider, FetchScheduler, set_default_scheduler
+    import app as api
+
+    provider = FakeProvider(latency=options['provider_latency'],
+                            latency_jitter=options['provider_jitter'],
+                            failure_rate=options['provider_failure_rate'])
+    set_default_scheduler(FetchScheduler(provider, rate=1000, burst=1000))
+    api.MAIN_RESULTS_DIR = os.path.join(options['work_dir'], 'results')
+    api.API_RESULTS_DIR = os.path.join(options['work_dir'], 'api_results')
+    if options['stub_model']:
+        api.predict_with_cascade = stub_predict
+
+    make_server('127.0.0.1', port, api.app, threaded=True).serve_forever()
+
+
+def cleanup(options):
+    """Remove the shared memory segments and files the app workers left behind"""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    from backend.shared_store import SharedArrayStore
+
+    SharedArrayStore(options['store_dir']).destroy()
+    shutil.rmtree(options['work_dir'], ignore_errors=True)
+
+
+def sample_process(pid):
+    """Return (cpu_seconds, rss_bytes) of a process, or (None, None) if unavailable"""
+    if PSUTIL_AVAILABLE:
+        try:
+            process = psutil.Process(pid)
+            cpu = process.cpu_times()
+            return cpu.user + cpu.system, process.memory_info().rss
+        except psutil.Error:
+            return None, None
+
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        return cpu_seconds, int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return None, None
+
+
+class ResourceSampler(threading.Thread):
+    """Samples CPU time and RSS of the worker processes while the load runs"""
+
+    def __init__(self, workers, interval=0.5):
+        super().__init__(daemon=True)
+        self.workers = workers
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.start_cpu = {}
+        self.last_cpu = {}
+        self.peak_rss = {}
+        self.rss_samples = {}
+
+    def sample(self):
+        for worker in self.workers:
+            cpu, rss = sample_process(worker['pid'])
+            if cpu is None:
+                continue
+            self.start_cpu.setdefault(worker['pid'], cpu)
+            self.last_cpu[worker['pid']] = cpu
+            self.peak_rss[worker['pid']] = max(self.peak_rss.get(worker['pid'], 0), rss)
+            self.rss_samples.setdefault(worker['pid'], []).append(rss)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.sample()
+
+    def report(self, elapsed):
+        report = []
+        for worker in self.workers:
+            pid = worker['pid']
+            if pid not in self.last_cpu:
+                report.append({'pid': pid, 'port': worker['port'], 'cpu_seconds': None,
+                               'cpu_utilization': None, 'mean_rss_mb': None, 'peak_rss_mb': None})
+                continue
+            cpu_seconds = self.last_cpu[pid] - self.start_cpu[pid]
+            report.append({
+                'pid': pid,
+                'port': worker['port'],
+                'cpu_seconds': round(cpu_seconds, 3),
+                'cpu_utilization': round(cpu_seconds / elapsed, 3) if elapsed else None,
+                'mean_rss_mb': round(np.mean(self.rss_samples[pid]) / 2 ** 20, 1),
+                'peak_rss_mb': round(self.peak_rss[pid] / 2 ** 20, 1)
+            })
+        return report
+
+
+def parse_mix(mix):
+    """Parse a request mix like 'predict=1,results=4' into normalized weights"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('predict', 'results'):
+            raise ValueError(f"Unknown request type in mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def send_request(base_url, kind, options, rng):
+    """Send one request; returns (status_code, latency_seconds)"""
+    if kind == 'predict':
+        symbols = rng.sample(options['symbols'], min(options['symbols_per_request'], len(options['symbols'])))
+        body = {'symbols': symbols, 'model_tier': options['tier']}
+        request = urllib.request.Request(f'{base_url}/predict', data=json.dumps(body).encode(),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+    else:
+        filename = rng.choice(options['results_files'])
+        request = urllib.request.Request(f'{base_url}/api/results/{filename}')
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=options['timeout']) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles (ms), error rate and throughput of a list of (status, latency)"""
+    if not samples:
+        return {'requests': 0}
+    latencies = np.array([latency for _, latency in samples]) * 1000
+    errors = sum(1 for status, _ in samples if status == 0 or status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4),
+        'throughput_rps': round(len(samples) / elapsed, 2),
+        'latency_ms': {
+            'mean': round(float(latencies.mean()), 2),
+            'p50': round(float(np.percentile(latencies, 50)), 2),
+            'p90': round(float(np.percentile(latencies, 90)), 2),
+            'p99': round(float(np.percentile(latencies, 99)), 2),
+            'max': round(float(latencies.max()), 2)
+        }
+    }
+
+
+def wait_until_ready(base_url, timeout=120):
+    """Poll a worker's health route until it answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'{base_url}/api/health', timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"App worker at {base_url} did not start within {timeout} seconds")
+
+
+def run_load_test(options):
+    """Start the app workers, warm them up, drive the request mix and collect the results"""
+    weights = parse_mix(options['mix'])
+    context = multiprocessing.get_context('spawn')
+    server_options = {
+        'store_dir': tempfile.mkdtemp(prefix='load_test_store_'),
+        'work_dir': tempfile.mkdtemp(prefix='load_test_work_'),
+        'provider_latency': options['provider_latency'],
+        'provider_jitter': options['provider_jitter'],
+        'provider_failure_rate': options['provider_failure_rate'],
+        'stub_model': options['stub_model']
+    }
+
+    workers = []
+    processes = []
+    try:
+        for i in range(options['workers']):
+            port = options['port'] + i
+            process = context.Process(target=serve, args=(port, server_options), daemon=True)
+            process.start()
+            processes.append(process)
+            workers.append({'pid': process.pid, 'port': port, 'url': f'http://127.0.0.1:{port}'})
+        for worker in workers:
+            wait_until_ready(worker['url'])
+        print(f"Started {len(workers)} app workers", file=sys.stderr)
+
+        # Warm up: every worker loads the symbols and writes the result files once
+        rng = random.Random(options['seed'])
+        for worker in workers:
+            warmup = dict(options, symbols_per_request=len(options['symbols']))
+            status, latency = send_request(worker['url'], 'predict', warmup, rng)
+            print(f"Warm-up on port {worker['port']}: HTTP {status} in {latency:.2f}s", file=sys.stderr)
+
+        samples = {kind: [] for kind in weights}
+        samples_lock = threading.Lock()
+        deadline = time.time() + options['duration']
+        kinds = list(weights)
+        kind_weights = [weights[kind] for kind in kinds]
+
+        def user(user_id):
+            user_rng = random.Random(options['seed'] + user_id)
+            request_number = 0
+            while time.time() < deadline:
+                kind = user_rng.choices(kinds, kind_weights)[0]
+                # Round-robin over the workers like a simple load balancer
+                worker = workers[(user_id + request_number) % len(workers)]
+                status, latency = send_request(worker['url'], kind, options, user_rng)
+                with samples_lock:
+                    samples[kind].append((status, latency))
+                request_number += 1
+
+        sampler = ResourceSampler(workers)
+        sampler.start()
+        started = time.time()
+        threads = [threading.Thread(target=user, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - started
+        sampler.stop()
+
+        all_samples = [sample for kind_samples in samples.values() for sample in kind_samples]
+        return {
+            'config': {key: options[key] for key in (
+                'workers', 'concurrency', 'duration', 'mix', 'tier', 'stub_model', 'symbols',
+                'symbols_per_request', 'results_files', 'provider_latency', 'provider_jitter',
+                'provider_failure_rate')},
+            'elapsed_seconds': round(elapsed, 2),
+            'overall': summarize(all_samples, elapsed),
+            'endpoints': {kind: summarize(kind_samples, elapsed) for kind, kind_samples in samples.items()},
+            'workers': sampler.report(elapsed)
+        }
+
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join(timeout=10)
+        cleanup(server_options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the prediction API with a stubbed data provider')
+    parser.add_argument('--workers', type=int, default=2, help='Number of app worker processes')
+    parser.add_argument('--port', type=int, default=5100, help='Port of the first worker')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent users')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load after warm-up')
+    parser.add_argument('--mix', default='predict=1,results=4',
+                        help="Request mix as weights, e.g. 'predict=1,results=4'")
+    parser.add_argument('--symbols', default='AAPL,MSFT,GOOG,AMZN,NVDA,META,TSLA,JPM',
+                        help='Comma separated symbols served by the fake provider')
+    parser.add_argument('--symbols-per-request', type=int, default=2)
+    parser.add_argument('--results-files', default='closing_prices.png,volume.png,moving_averages.png',
+                        help='Comma separated files requested from /api/results')
+    parser.add_argument('--tier', choices=['auto', 'fast', 'lstm'], default='fast',
+                        help='Model tier requested from /predict')
+    parser.add_argument('--stub-model', action='store_true',
+                        help='Replace the model with a no-training stub to measure API overhead only')
+    parser.add_argument('--provider-latency', type=float, default=0.05, help='Fake provider latency in seconds')
+    parser.add_argument('--provider-jitter', type=float, default=0.05, help='Extra random provider latency')
+    parser.add_argument('--provider-failure-rate', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--max-p99-ms', type=float, help='Exit with status 1 if the overall p99 is above this')
+    parser.add_argument('--max-error-rate', type=float, help='Exit with status 1 if the error rate is above this')
+    args = parser.parse_args()
+
+    options = vars(args)
+    options['symbols'] = [symbol.strip() for symbol in args.symbols.split(',') if symbol.strip()]
+    options['results_files'] = [name.strip() for name in args.results_files.split(',') if name.strip()]
+
+    report = run_load_test(options)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    overall = report['overall']
+    failed_gates = []
+    if args.max_p99_ms is not None and overall.get('latency_ms', {}).get('p99', 0) > args.max_p99_ms:
+        failed_gates.append(f"p99 {overall['latency_ms']['p99']}ms > {args.max_p99_ms}ms")
+    if args.max_error_rate is not None and overall.get('error_rate', 0) > args.max_error_rate:
+        failed_gates.append(f"error rate {overall['error_rate']} > {args.max_error_rate}")
+    if failed_gates:
+        print(f"Load test gates failed: {'; '.join(failed_gates)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
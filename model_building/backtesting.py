@@ -0,0 +1,341 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+from keras.callbacks import EarlyStopping
+
+from model_building.model_training_and_prediction import (
+    load_price_data, build_lstm_model, calculate_metrics
+)
+from model_building.model_registry import get_model_config
+from model_building.json_files import write_json, read_json
+from model_building.file_locks import try_lock, release_lock
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'results')
+BACKTEST_DIR = os.path.join(RESULTS_DIR, 'backtests')
+METRIC_NAMES = ['rmse', 'normalized_rmse', 'mae', 'r2', 'directional_accuracy']
+
+
+def walk_forward_splits(n_samples, n_folds=5, mode='expanding', sequence_length=60, initial_train=0.5):
+    """Return (train_start, train_end, test_end) index triples for each fold
+
+    The first fold trains on the first `initial_train` share of the history and
+    the rest is cut into n_folds consecutive test blocks. In 'expanding' mode the
+    training window always starts at 0, in 'rolling' mode it keeps its initial
+    length and slides forward with the test block.
+    """
+    if mode not in ('expanding', 'rolling'):
+        raise ValueError(f"Unknown walk-forward mode: {mode}")
+
+    train_len = int(np.ceil(n_samples * initial_train))
+    test_len = (n_samples - train_len) // n_folds
+    if train_len <= sequence_length + 1 or test_len < 2:
+        raise ValueError(f"Insufficient historical data for {n_folds} folds. Got {n_samples} days.")
+
+    splits = []
+    for fold in range(n_folds):
+        train_end = train_len + fold * test_len
+        test_end = n_samples if fold == n_folds - 1 else train_end + test_len
+        train_start = 0 if mode == 'expanding' else train_end - train_len
+        splits.append((train_start, train_end, test_end))
+    return splits
+
+
+def fold_datasets(prices, train_start, train_end, test_end, sequence_length):
+    """Build scaled (x_train, y_train, x_test, y_test) for one fold
+
+    All folds slice the same sliding-window view of the price array, so the
+    windows themselves are never materialised more than once per fold. Scaling
+    uses only the fold's training range to avoid look-ahead.
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(prices, sequence_length + 1)
+    price_min = float(prices[train_start:train_end].min())
+    price_range = float(prices[train_start:train_end].max()) - price_min or 1.0
+
+    # Window i covers prices[i:i + sequence_length] and predicts prices[i + sequence_length]
+    train_windows = windows[train_start:train_end - sequence_length]
+    test_windows = windows[train_end - sequence_length:test_end - sequence_length]
+
+    x_train = ((train_windows[:, :-1] - price_min) / price_range).astype(np.float32, copy=False)[..., np.newaxis]
+    y_train = ((train_windows[:, -1] - price_min) / price_range).astype(np.float32, copy=False)
+    x_test = ((test_windows[:, :-1] - price_min) / price_range).astype(np.float32, copy=False)[..., np.newaxis]
+    y_test = np.asarray(test_windows[:, -1]).reshape(-1, 1)
+    return x_train, y_train, x_test, y_test, price_min, price_range
+
+
+def run_fold(task):
+    """Train and evaluate the LSTM on one walk-forward fold (runs in a worker process)"""
+    prices = np.load(task['prices_path'], mmap_mode='r')
+    config = task['config']
+    x_train, y_train, x_test, y_test, price_min, price_range = fold_datasets(
+        prices, task['train_start'], task['train_end'], task['test_end'], config['sequence_length'])
+
+    model = build_lstm_model(config)
+    early_stopping = EarlyStopping(monitor='loss', patience=10, restore_best_weights=True)
+    history = model.fit(
+        x_train,
+        y_train,
+        batch_size=config['batch_size'],
+        epochs=task['epochs'],
+        callbacks=[early_stopping],
+        verbose=0
+    )
+
+    predictions = model.predict(x_test, verbose=0) * price_range + price_min
+    metrics = {name: float(value) for name, value in calculate_metrics(y_test, predictions).items()}
+    metrics['final_loss'] = float(history.history['loss'][-1])
+
+    result = {
+        'symbol': task['symbol'],
+        'fold': task['fold'],
+        'train_start': task['dates'][task['train_start']],
+        'train_end': task['dates'][task['train_end'] - 1],
+        'test_start': task['dates'][task['train_end']],
+        'test_end': task['dates'][task['test_end'] - 1],
+        'train_samples': int(len(x_train)),
+        'test_samples': int(len(x_test)),
+        'metrics': metrics
+    }
+    write_json(task['checkpoint_path'], result)
+    return result
+
+
+def acquire_job_lock(job_dir):
+    """Lock a job directory for this process, or return None if a live process already owns it
+
+    The lock is released when its file descriptor is closed, including when
+    the owning process dies, so an interrupted job can be resumed right away.
+    Without flock support every process may run any job.
+    """
+    return try_lock(os.path.join(job_dir, 'job.lock'))
+
+
+def is_backtest_running(job_id):
+    """Whether some process (in any worker) is currently running the job"""
+    job_dir = os.path.join(BACKTEST_DIR, job_id)
+    if not os.path.isdir(job_dir):
+        return False
+    fd = acquire_job_lock(job_dir)
+    release_lock(fd)
+    return fd is None
+
+
+def backtest_job_id(symbols, n_folds, mode, sequence_length, days, epochs):
+    """Job id of a backtest, reusing the newest job with the same parameters when possible
+
+    Ids are <parameter hash>-<start date>. The registered model configs are part
+    of the hash, so re-tuning a symbol starts a new job instead of mixing folds
+    of two architectures. An unfinished job is resumed whatever day it started
+    (a run interrupted before midnight is not restarted from scratch); a
+    finished job is only reused on the day it started.
+    """
+    configs = [get_model_config(symbol) for symbol in sorted(symbols)]
+    key = json.dumps([sorted(symbols), n_folds, mode, sequence_length, days, epochs, configs], sort_keys=True)
+    prefix = hashlib.sha1(key.encode()).hexdigest()[:12]
+    today = datetime.now().strftime('%Y%m%d')
+
+    if os.path.isdir(BACKTEST_DIR):
+        jobs = sorted(name for name in os.listdir(BACKTEST_DIR) if name.startswith(f'{prefix}-'))
+        if jobs:
+            status = get_backtest_status(jobs[-1])
+            if status is None or status['status'] == 'running' or jobs[-1].endswith(today):
+                return jobs[-1]
+    return f'{prefix}-{today}'
+
+
+def aggregate_metrics(fold_results):
+    """Mean, std, min and max of every metric across folds"""
+    summary = {}
+    for name in METRIC_NAMES:
+        values = np.array([result['metrics'][name] for result in fold_results], dtype=float)
+        summary[name] = {
+            'mean': float(values.mean()),
+            'std': float(values.std()),
+            'min': float(values.min()),
+            'max': float(values.max())
+        }
+    return summary
+
+
+def save_backtest_report(symbol, fold_results, summary, mode):
+    """Save walk-forward backtest metrics to text report"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report_path = os.path.join(RESULTS_DIR, f'{symbol}_backtest_report.txt')
+
+    with open(report_path, 'w') as f:
+        f.write(f'Walk-Forward Backtest Report for {symbol}\n')
+        f.write('=' * 50 + '\n\n')
+        f.write(f'Mode: {mode} training window, {len(fold_results)} folds\n\n')
+
+        f.write('Per-Fold Metrics:\n')
+        f.write('-' * 20 + '\n')
+        f.write(f'{"Fold":<6}{"Test Period":<25}{"RMSE":>10}{"NRMSE %":>10}{"MAE":>10}{"R2":>10}{"Dir %":>10}\n')
+        for result in fold_results:
+            metrics = result['metrics']
+            period = f'{result["test_start"]} - {result["test_end"]}'
+            f.write(f'{result["fold"]:<6}{period:<25}')
+            f.write(f'{metrics["rmse"]:>10.2f}{metrics["normalized_rmse"]:>10.2f}{metrics["mae"]:>10.2f}')
+            f.write(f'{metrics["r2"]:>10.4f}{metrics["directional_accuracy"]:>10.2f}\n')
+
+        f.write('\nAggregate Metrics (mean ± std):\n')
+        f.write('-' * 25 + '\n')
+        for name in METRIC_NAMES:
+            f.write(f'{name}: {summary[name]["mean"]:.4f} ± {summary[name]["std"]:.4f}\n')
+
+    print(f"Backtest report saved: {report_path}")
+    return report_path
+
+
+def run_backtest(symbols, n_folds=5, mode='expanding', sequence_length=None, days=3*365,
+                 epochs=100, max_workers=None, job_id=None):
+    """Walk-forward backtest of the LSTM predictor over one or more symbols
+
+    Each symbol uses its registered model config; sequence_length overrides the
+    registered window length. Folds of all symbols are trained in parallel in a process pool. Each finished
+    fold is checkpointed under results/backtests/<job_id>/, so running the same
+    job again only trains the folds that are still missing. While a process runs
+    the job it holds the job lock; running it elsewhere meanwhile only returns
+    the current status.
+    """
+    job_id = job_id or backtest_job_id(symbols, n_folds, mode, sequence_length, days, epochs)
+    job_dir = os.path.join(BACKTEST_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    # Only one process runs a job at a time; the others leave its checkpoints alone
+    lock_fd = acquire_job_lock(job_dir)
+    if lock_fd is None:
+        print(f"Backtest {job_id} is already running in another process")
+        return get_backtest_status(job_id)
+    try:
+        return _run_locked_backtest(symbols, job_id, job_dir, n_folds, mode, sequence_length,
+                                    days, epochs, max_workers)
+    finally:
+        release_lock(lock_fd)
+
+
+def _run_locked_backtest(symbols, job_id, job_dir, n_folds, mode, sequence_length, days, epochs, max_workers):
+    print(f"\nRunning walk-forward backtest {job_id} ({mode}, {n_folds} folds)...")
+
+    status = {'job_id': job_id, 'status': 'running', 'symbols': symbols, 'n_folds': n_folds,
+              'mode': mode, 'owner': {'host': socket.gethostname(), 'pid': os.getpid()}, 'errors': {}}
+    write_json(os.path.join(job_dir, 'status.json'), status)
+
+    tasks = []
+    results = {symbol: [] for symbol in symbols}
+    for symbol in symbols:
+        try:
+            prices_path = os.path.join(job_dir, f'{symbol}_prices.npy')
+            dates_path = os.path.join(job_dir, f'{symbol}_dates.json')
+            if not os.path.exists(prices_path) or not os.path.exists(dates_path):
+                data = load_price_data(symbol, days=days)
+                np.save(prices_path, data['Close'].to_numpy())
+                write_json(dates_path, [date.strftime('%Y-%m-%d') for date in data.index])
+            dates = read_json(dates_path)
+
+            config = get_model_config(symbol)
+            if sequence_length is not None:
+                config['sequence_length'] = sequence_length
+            splits = walk_forward_splits(len(dates), n_folds, mode, config['sequence_length'])
+            for fold, (train_start, train_end, test_end) in enumerate(splits, 1):
+                checkpoint_path = os.path.join(job_dir, f'{symbol}_fold{fold}.json')
+                checkpoint = read_json(checkpoint_path)
+                if checkpoint is not None:
+                    print(f"Resuming: {symbol} fold {fold} already completed")
+                    results[symbol].append(checkpoint)
+                    continue
+                tasks.append({
+                    'symbol': symbol,
+                    'fold': fold,
+                    'prices_path': prices_path,
+                    'dates': dates,
+                    'train_start': train_start,
+                    'train_end': train_end,
+                    'test_end': test_end,
+                    'config': config,
+                    'epochs': epochs,
+                    'checkpoint_path': checkpoint_path
+                })
+        except Exception as e:
+            print(f"Error preparing backtest for {symbol}: {str(e)}")
+            status['errors'][symbol] = str(e)
+
+    if tasks:
+        max_workers = max_workers or max(1, min(len(tasks), (os.cpu_count() or 2) // 2))
+        print(f"Training {len(tasks)} folds with {max_workers} worker processes...")
+        # TensorFlow is not fork-safe, so workers are started fresh
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = {executor.submit(run_fold, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    result = future.result()
+                    results[task['symbol']].append(result)
+                    print(f"Completed {task['symbol']} fold {task['fold']}: "
+                          f"RMSE {result['metrics']['rmse']:.2f}")
+                except Exception as e:
+                    print(f"Error in {task['symbol']} fold {task['fold']}: {str(e)}")
+                    status['errors'][f"{task['symbol']}_fold{task['fold']}"] = str(e)
+
+    per_symbol = {}
+    for symbol, fold_results in results.items():
+        if not fold_results:
+            continue
+        fold_results.sort(key=lambda result: result['fold'])
+        summary = aggregate_metrics(fold_results)
+        save_backtest_report(symbol, fold_results, summary, mode)
+        per_symbol[symbol] = {'folds': fold_results, 'summary': summary}
+
+    status.update({
+        'status': 'completed' if not status['errors'] else 'completed_with_errors',
+        'results': per_symbol,
+        'overall': aggregate_metrics([r for s in per_symbol.values() for r in s['folds']])
+        if per_symbol else None
+    })
+    write_json(os.path.join(job_dir, 'status.json'), status)
+    print(f"\nBacktest {job_id} finished. Results saved to {job_dir}")
+    return status
+
+
+def get_backtest_status(job_id):
+    """Return the stored status of a backtest job, or None if it does not exist"""
+    return read_json(os.path.join(BACKTEST_DIR, job_id, 'status.json'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward backtest of the LSTM stock predictor')
+    parser.add_argument('symbols', nargs='+', help='Stock symbols to backtest')
+    parser.add_argument('--folds', type=int, default=5, help='Number of walk-forward folds')
+    parser.add_argument('--mode', choices=['expanding', 'rolling'], default='expanding',
+                        help='Expanding or rolling training window')
+    parser.add_argument('--days', type=int, default=3*365, help='Days of history to download')
+    parser.add_argument('--sequence-length', type=int, default=None,
+                        help='Override the registered sequence length')
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--job-id', default=None, help='Resume a specific backtest job')
+    args = parser.parse_args()
+
+    status = run_backtest(args.symbols, n_folds=args.folds, mode=args.mode,
+                          sequence_length=args.sequence_length, days=args.days,
+                          epochs=args.epochs, max_workers=args.workers, job_id=args.job_id)
+
+    # Another process holds the job lock; its status only has results once it finishes
+    if status is None or 'results' not in status:
+        print(f"Backtest is already running, current status:\n{json.dumps(status, indent=2)}")
+        return
+
+    for symbol, result in status['results'].items():
+        summary = result['summary']
+        print(f"{symbol}: RMSE {summary['rmse']['mean']:.2f} ± {summary['rmse']['std']:.2f}, "
+              f"Directional Accuracy {summary['directional_accuracy']['mean']:.2f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -111,18 +111,26 @@ def analyze_daily_returns(company_list):
     plt.savefig('results/daily_returns.png')
     plt.close()
 
-def plot_correlation_analysis(stock_list):
+def plot_correlation_analysis(stock_list, company_list=None):
     """Analyze correlation between stocks"""
     if len(stock_list) < 2:
         print("Need at least 2 stocks for correlation analysis")
         return pd.DataFrame()  # Return empty DataFrame if not enough stocks
         
     try:
-        # Get closing prices for all stocks
-        closing_df = yf.download(stock_list, 
-                               start=datetime.now() - pd.DateOffset(years=1),
-                               end=datetime.now(),
-                               progress=False)['Adj Close']
+        # Get closing prices for all stocks, reusing already downloaded data if available
+        if company_list:
+            closing_df = pd.concat(
+                {company['company_name'].iloc[0]: company['Adj Close'].squeeze(axis=1)
+                 if isinstance(company['Adj Close'], pd.DataFrame) else company['Adj Close']
+                 for company in company_list},
+                axis=1
+            )
+        else:
+            closing_df = yf.download(stock_list, 
+                                   start=datetime.now() - pd.DateOffset(years=1),
+                                   end=datetime.now(),
+                                   progress=False)['Adj Close']
         
         # Calculate daily returns
         tech_rets = closing_df.pct_change()
@@ -186,7 +194,7 @@ def main_analysis(company_list, stock_list):
         analyze_daily_returns(company_list)
         print("- Daily returns plot saved")
         
-        tech_rets = plot_correlation_analysis(stock_list)
+        tech_rets = plot_correlation_analysis(stock_list, company_list)
         if not tech_rets.empty:
             print("- Correlation analysis plots saved")
         
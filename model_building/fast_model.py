@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+from sklearn.linear_model import Ridge
+
+from model_building.model_registry import FAST_MODEL_CONFIG
+from model_building.model_training_and_prediction import (
+    load_price_data, calculate_metrics, save_prediction_report, predict_stock_price, build_prediction_frame,
+    TRAIN_SPLIT
+)
+from model_building.scaling import MinMaxPriceScaler
+
+# Escalate to the LSTM when the fast model's backtest normalized RMSE (%) is above this
+FAST_MODEL_MAX_NRMSE = float(os.environ.get('FAST_MODEL_MAX_NRMSE', 5.0))
+MODEL_TIERS = ('auto', 'fast', 'lstm')
+
+
+def predict_stock_price_fast(symbol, stock_data=None, config=None, save_report=True):
+    """Predict stock price with a lag-feature ridge regression
+
+    Uses the same 80/20 split and metric set as the LSTM, but the lag matrix is
+    a sliding-window view of the price series and the model trains in
+    milliseconds on CPU. The prediction report is skipped if save_report is False.
+    """
+    try:
+        config = config or FAST_MODEL_CONFIG
+        lags = config['lags']
+        data = load_price_data(symbol, stock_data)
+        prices = data['Close'].to_numpy()
+
+        training_data_len = int(np.ceil(len(prices) * TRAIN_SPLIT))
+        if training_data_len <= lags:
+            raise ValueError(f"Insufficient historical data for {symbol}. Need more than {lags} training days.")
+
+        # Scale with the training range only, so the test period is never seen during fitting
+        scaler = MinMaxPriceScaler().fit(prices[:training_data_len])
+        scaled = scaler.transform(prices)
+
+        # Window i holds scaled[i:i + lags] followed by its target scaled[i + lags]
+        windows = np.lib.stride_tricks.sliding_window_view(scaled, lags + 1)
+        train_windows = windows[:training_data_len - lags]
+        test_windows = windows[training_data_len - lags:]
+
+        model = Ridge(alpha=config['alpha'])
+        model.fit(train_windows[:, :-1], train_windows[:, -1])
+
+        train_residuals = model.predict(train_windows[:, :-1]) - train_windows[:, -1]
+        predictions = model.predict(test_windows[:, :-1])
+        scaler.inverse_transform(predictions, out=predictions)
+        test_data = data[training_data_len:]
+        y_test = test_data['Close'].to_numpy()
+
+        metrics = calculate_metrics(y_test, predictions)
+        metrics['final_loss'] = float(np.mean(train_residuals ** 2))
+        metrics['model_tier'] = 'fast'
+
+        valid = build_prediction_frame(test_data, predictions)
+
+        if save_report:
+            save_prediction_report(metrics, symbol, test_data, predictions, config)
+        print(f"Fast model for {symbol}: normalized RMSE {metrics['normalized_rmse']:.2f}%")
+        return valid, metrics
+
+    except Exception as e:
+        print(f"Error in predict_stock_price_fast for {symbol}: {str(e)}")
+        raise ValueError(f"Failed to process {symbol}: {str(e)}")
+
+
+def predict_with_cascade(symbol, stock_data=None, tier='auto', max_nrmse=None):
+    """Predict with the fast model and fall back to the LSTM when needed
+
+    tier='fast' and tier='lstm' force a model. With tier='auto' the fast model
+    is used unless its backtest normalized RMSE on the held-out period is above
+    max_nrmse (or it fails), in which case the LSTM is trained instead.
+    """
+    if tier not in MODEL_TIERS:
+        raise ValueError(f"Unknown model tier: {tier}. Use one of {', '.join(MODEL_TIERS)}")
+
+    if tier == 'lstm':
+        valid, metrics = predict_stock_price(symbol, stock_data)
+        metrics['model_tier'] = 'lstm'
+        return valid, metrics
+
+    max_nrmse = FAST_MODEL_MAX_NRMSE if max_nrmse is None else max_nrmse
+    try:
+        valid, metrics = predict_stock_price_fast(symbol, stock_data)
+        if tier == 'fast' or metrics['normalized_rmse'] <= max_nrmse:
+            return valid, metrics
+        print(f"Fast model error for {symbol} is above {max_nrmse:.2f}%. Escalating to LSTM...")
+    except ValueError:
+        if tier == 'fast':
+            raise
+        print(f"Fast model failed for {symbol}. Escalating to LSTM...")
+
+    valid, metrics = predict_stock_price(symbol, stock_data)
+    metrics['model_tier'] = 'lstm'
+    return valid, metrics
@@ -0,0 +1,47 @@
+import os
+from contextlib import contextmanager
+
+# Advisory locks need POSIX flock; elsewhere callers fall back to per-process behaviour
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path (created if missing) and yield its file descriptor
+
+    flock locks belong to the open file, so this also excludes other threads of
+    the same process. Without flock support the block runs unlocked.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if FCNTL_AVAILABLE:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield fd
+    finally:
+        os.close(fd)
+
+
+def try_lock(path):
+    """Lock path without waiting: return the descriptor holding the lock, or None if it is taken
+
+    The lock is released by release_lock(), or when the owning process dies.
+    Without flock support every caller gets the lock and -1 is returned.
+    """
+    if not FCNTL_AVAILABLE:
+        return -1
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def release_lock(fd):
+    if fd not in (None, -1):
+        os.close(fd)
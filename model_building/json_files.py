@@ -0,0 +1,32 @@
+import json
+import os
+import tempfile
+
+
+def write_json(path, payload, indent=2):
+    """Atomically write a JSON file
+
+    The payload goes to a temporary file in the same directory that then
+    replaces path with os.replace, so readers (and a crashed run) see either
+    the old or the new file, never a partial one.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(payload, f, indent=indent)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_json(path):
+    """Read a JSON file, or return None if it is missing or unreadable"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
@@ -0,0 +1,82 @@
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+from backend.fetch_scheduler import FakeProvider
+from model_building.model_registry import get_model_config
+from model_building.model_training_and_prediction import load_price_data, prepare_training_windows
+from model_building.fast_model import predict_stock_price_fast
+
+
+def traced_peak(func, *args, **kwargs):
+    """Run func and return (result, peak bytes allocated by Python and numpy while it ran)"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def profile_symbol(symbol, stock_data, tier='lstm'):
+    """Peak allocations of the numeric prediction path for one symbol
+
+    For the LSTM this covers ingest, scaling and writing the windowed dataset,
+    everything before TensorFlow takes over (its tensors are not visible to
+    tracemalloc). For the fast model it covers the whole prediction; no report
+    is written.
+    """
+    data, ingest_peak = traced_peak(load_price_data, symbol, stock_data)
+    profile = {
+        'days': len(data),
+        'input_bytes': int(stock_data.memory_usage(deep=True).sum()),
+        'ingest_peak_bytes': ingest_peak
+    }
+
+    if tier == 'fast':
+        _, peak = traced_peak(predict_stock_price_fast, symbol, stock_data, save_report=False)
+    else:
+        dataset_dir = tempfile.mkdtemp(prefix=f'{symbol}_profile_')
+        try:
+            _, peak = traced_peak(prepare_training_windows, symbol, data, get_model_config(symbol), dataset_dir)
+        finally:
+            shutil.rmtree(dataset_dir, ignore_errors=True)
+    profile['model_peak_bytes'] = peak
+    profile['peak_bytes'] = max(ingest_peak, peak)
+    profile['peak_bytes_per_day'] = profile['peak_bytes'] / len(data)
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile peak memory of the prediction path per symbol')
+    parser.add_argument('symbols', nargs='+', help='Stock symbols to profile (prices are synthetic)')
+    parser.add_argument('--days', type=int, default=365, help='Days of synthetic price history per symbol')
+    parser.add_argument('--tier', choices=['fast', 'lstm'], default='lstm', help='Model tier to profile')
+    parser.add_argument('--max-peak-kb', type=float, help='Exit with status 1 if a symbol peaks above this')
+    args = parser.parse_args()
+
+    # Synthetic prices, so the profile does not depend on network access or market data
+    provider = FakeProvider(latency=0)
+    end = datetime.now()
+    start = end - timedelta(days=args.days)
+
+    report = {}
+    for symbol in args.symbols:
+        report[symbol] = profile_symbol(symbol, provider.download(symbol, start, end), args.tier)
+    print(json.dumps(report, indent=2))
+
+    if args.max_peak_kb is not None:
+        over = [symbol for symbol, profile in report.items() if profile['peak_bytes'] / 1024 > args.max_peak_kb]
+        if over:
+            print(f"Peak allocations above {args.max_peak_kb} KB for: {', '.join(over)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
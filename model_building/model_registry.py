@@ -0,0 +1,76 @@
+import os
+from datetime import datetime
+
+from model_building.json_files import write_json, read_json
+
+REGISTRY_PATH = os.environ.get(
+    'MODEL_REGISTRY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_registry.json')
+)
+
+# Architecture used when no tuned config has been registered for a symbol
+DEFAULT_MODEL_CONFIG = {
+    'sequence_length': 60,
+    'lstm_units': [128, 64],
+    'dense_units': 32,
+    'dropout': 0.2,
+    'batch_size': 32,
+    'loss': 'huber'
+}
+
+# Lag-feature model used by the fast prediction tier
+FAST_MODEL_CONFIG = {
+    'model_type': 'ridge',
+    'lags': 10,
+    'alpha': 1e-3
+}
+
+
+def load_registry():
+    """Load the model registry, or an empty one if it does not exist yet"""
+    return read_json(REGISTRY_PATH) or {'models': {}}
+
+
+def register_model_config(symbol, config, metrics=None, source='tuning', tuning=None):
+    """Store the model config to use for a symbol (tuning describes the data it was chosen on)"""
+    registry = load_registry()
+    registry['models'][symbol] = {
+        'config': {**DEFAULT_MODEL_CONFIG, **config},
+        'metrics': metrics or {},
+        'source': source,
+        'tuning': tuning or {},
+        'updated_at': datetime.now().isoformat(timespec='seconds')
+    }
+
+    # Replace atomically so concurrent readers never see a partial file
+    write_json(REGISTRY_PATH, registry)
+    print(f"Registered model config for {symbol}: {config}")
+
+
+def get_model_config(symbol):
+    """Get the registered model config for a symbol, falling back to the default"""
+    entry = load_registry()['models'].get(symbol)
+    if entry is None:
+        return dict(DEFAULT_MODEL_CONFIG)
+    return {**DEFAULT_MODEL_CONFIG, **entry['config']}
+
+
+def describe_model_config(config):
+    """Human readable description of a model config, one line per layer/setting"""
+    if config.get('model_type') == 'ridge':
+        return [
+            f"- Ridge Regression on the last {config['lags']} closing prices",
+            f"- Regularization Strength (alpha): {config['alpha']}",
+            '- Output: next day closing price'
+        ]
+
+    lines = []
+    for i, units in enumerate(config['lstm_units']):
+        layer = 'Input Layer' if i == 0 else 'Hidden Layer'
+        lines.append(f"- {layer}: LSTM ({units} units) with Dropout ({config['dropout']})")
+    lines.append(f"- Dense Layer: {config['dense_units']} units (ReLU activation)")
+    lines.append('- Output Layer: 1 unit')
+    lines.append(f"- Sequence Length: {config['sequence_length']} days")
+    lines.append(f"- Batch Size: {config['batch_size']}")
+    lines.append(f"- Loss Function: {config['loss'].capitalize()}")
+    return lines
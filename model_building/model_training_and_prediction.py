@@ -1,7 +1,6 @@
 import numpy as np
 from keras.models import Sequential
 from keras.layers import Dense, LSTM, Dropout
-from sklearn.preprocessing import MinMaxScaler
 import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
@@ -10,6 +9,16 @@ from keras.callbacks import Callback, EarlyStopping
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import math
 import os
+import shutil
+import tempfile
+from model_building.model_registry import get_model_config, describe_model_config
+from model_building.windowed_dataset import write_windowed_dataset
+from model_building.scaling import MinMaxPriceScaler
+
+# History and train/test split of every prediction; tuning uses the same, so
+# a registered config is chosen on the data regime it is used for
+PRICE_HISTORY_DAYS = 365
+TRAIN_SPLIT = .80
 
 class ProgressCallback(Callback):
     def on_epoch_end(self, epoch, logs=None):
@@ -54,7 +63,7 @@ def save_prediction_plot(data, predictions, symbol):
         plt.close()
         return None
 
-def save_prediction_report(metrics, symbol, data, predictions):
+def save_prediction_report(metrics, symbol, data, predictions, config=None):
     """Save prediction metrics to text report"""
     try:
         results_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'results')
@@ -62,9 +71,10 @@ def save_prediction_report(metrics, symbol, data, predictions):
         
         report_path = os.path.join(results_dir, f'{symbol}_prediction_report.txt')
         
-        # Get last 30 days of actual and predicted values
-        last_30_days = data.tail(30).copy()
-        last_30_days['Predictions'] = predictions[-30:]
+        # Last 30 days of actual and predicted values, read as views of the inputs
+        last_30_dates = data.index[-30:]
+        last_30_actual = data['Close'].to_numpy()[-30:]
+        last_30_predicted = np.ravel(predictions)[-30:]
         
         with open(report_path, 'w') as f:
             f.write(f'Prediction Report for {symbol}\n')
@@ -73,10 +83,9 @@ def save_prediction_report(metrics, symbol, data, predictions):
             # Model Architecture
             f.write('Model Architecture:\n')
             f.write('-' * 20 + '\n')
-            f.write('- Input Layer: LSTM (128 units) with Dropout (0.2)\n')
-            f.write('- Hidden Layer: LSTM (64 units) with Dropout (0.2)\n')
-            f.write('- Dense Layer: 32 units (ReLU activation)\n')
-            f.write('- Output Layer: 1 unit\n\n')
+            for line in describe_model_config(config or get_model_config(symbol)):
+                f.write(line + '\n')
+            f.write('\n')
             
             # Performance Metrics
             f.write('Model Performance Metrics:\n')
@@ -94,10 +103,10 @@ def save_prediction_report(metrics, symbol, data, predictions):
             f.write(f'{"Date":<12}{"Actual Price":>15}{"Predicted Price":>18}\n')
             f.write('-' * 45 + '\n')
             
-            for date, row in last_30_days.iterrows():
+            for date, actual, predicted in zip(last_30_dates, last_30_actual, last_30_predicted):
                 f.write(f'{date.strftime("%Y-%m-%d"):<12}')
-                f.write(f'${row["Close"]:>14.2f}')
-                f.write(f'${row["Predictions"]:>17.2f}\n')
+                f.write(f'${actual:>14.2f}')
+                f.write(f'${predicted:>17.2f}\n')
         
         print(f"Report saved: {report_path}")
         
@@ -105,87 +114,193 @@ def save_prediction_report(metrics, symbol, data, predictions):
         print(f"Error saving report for {symbol}: {str(e)}")
         raise
 
-def predict_stock_price(symbol):
-    """Predict stock price using LSTM"""
+def save_final_report(all_metrics, failed_symbols=None):
+    """Save a summary report of the metrics of all processed symbols"""
     try:
-        print(f"\nProcessing predictions for {symbol}...")
-        
-        # Get the stock data
-        end = datetime.now()
-        start = end - timedelta(days=1*365)  # Get 5 years of data
-        
-        print(f"Fetching data from {start.date()} to {end.date()}...")
-        df = yf.download(symbol, start=start, end=end)
-        
-        if df.empty:
-            raise ValueError(f"No data available for {symbol}")
-        
-        print(f"Retrieved {len(df)} days of data")
-        print(f"Available columns: {df.columns.tolist()}")
+        results_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'results')
+        os.makedirs(results_dir, exist_ok=True)
         
-        # Check if 'Adj Close' is available, if not use 'Close'
-        if 'Adj Close' in df.columns:
-            price_column = 'Adj Close'
-        elif 'Close' in df.columns:
-            price_column = 'Close'
-        else:
-            raise ValueError(f"No price data (Close or Adj Close) available for {symbol}")
-            
-        # Create a new dataframe with only the price column
-        data = df[[price_column]].copy()
-        data.columns = ['Close']  # Rename to 'Close' for consistency
+        report_path = os.path.join(results_dir, 'final_model_report.txt')
+        metric_names = ['rmse', 'normalized_rmse', 'mae', 'r2', 'directional_accuracy']
         
-        if data.empty:
-            raise ValueError(f"No price data available for {symbol}")
+        with open(report_path, 'w') as f:
+            f.write('Final Model Report\n')
+            f.write('=' * 50 + '\n\n')
+            f.write(f'Symbols processed: {len(all_metrics)}\n')
+            f.write(f'Symbols failed: {len(failed_symbols or {})}\n\n')
             
-        if len(data) < 60:
-            raise ValueError(f"Insufficient historical data for {symbol}. Need at least 60 days, got {len(data)} days.")
-        
-        # Check for and handle NaN values
-        if data['Close'].isna().any():
-            print(f"Warning: Found {data['Close'].isna().sum()} NaN values. Filling with forward fill method.")
-            data['Close'] = data['Close'].fillna(method='ffill')
-            if data['Close'].isna().any():
-                data['Close'] = data['Close'].fillna(method='bfill')
+            if all_metrics:
+                # Aggregate Metrics
+                f.write('Aggregate Metrics (mean / median):\n')
+                f.write('-' * 35 + '\n')
+                for name in metric_names:
+                    values = np.array([metrics[name] for metrics in all_metrics.values()], dtype=float)
+                    f.write(f'{name}: {np.mean(values):.4f} / {np.median(values):.4f}\n')
+                f.write('\n')
                 
-        # Convert to numpy array and ensure proper shape
-        dataset = data['Close'].values.reshape(-1, 1)
-        print(f"Dataset shape: {dataset.shape}")
+                # Per-Symbol Metrics
+                f.write('Per-Symbol Metrics:\n')
+                f.write('-' * 20 + '\n')
+                f.write(f'{"Symbol":<10}{"Tier":<8}{"RMSE":>10}{"NRMSE %":>10}{"MAE":>10}{"R2":>10}{"Dir %":>10}\n')
+                f.write('-' * 68 + '\n')
+                for symbol, metrics in sorted(all_metrics.items(), key=lambda item: item[1]['normalized_rmse']):
+                    f.write(f'{symbol:<10}{metrics.get("model_tier", "lstm"):<8}')
+                    f.write(f'{metrics["rmse"]:>10.2f}{metrics["normalized_rmse"]:>10.2f}{metrics["mae"]:>10.2f}')
+                    f.write(f'{metrics["r2"]:>10.4f}{metrics["directional_accuracy"]:>10.2f}\n')
+                f.write('\n')
+            
+            if failed_symbols:
+                f.write('Failed Symbols:\n')
+                f.write('-' * 15 + '\n')
+                for symbol, reason in sorted(failed_symbols.items()):
+                    f.write(f'- {symbol}: {reason}\n')
         
-        # Calculate training size
-        training_data_len = int(np.ceil(len(dataset) * .80))
-        print(f"Training data length: {training_data_len}")
+        print(f"Final report saved: {report_path}")
+        return report_path
         
-        # Scale the data
-        scaler = MinMaxScaler(feature_range=(0,1))
-        scaled_data = scaler.fit_transform(dataset)
+    except Exception as e:
+        print(f"Error saving final report: {str(e)}")
+        raise
+
+def load_price_data(symbol, stock_data=None, days=PRICE_HISTORY_DAYS):
+    """Get a single-column 'Close' price DataFrame for a symbol
+
+    stock_data can be an already downloaded price DataFrame (e.g. a shared
+    store view) to avoid downloading the symbol again. Prices are float32; the
+    conversion below is the only copy of the price column made here.
+    """
+    if stock_data is not None:
+        df = stock_data
+    else:
+        # Get the stock data
+        end = datetime.now()
+        start = end - timedelta(days=days)
         
-        # Create training dataset
-        train_data = scaled_data[0:training_data_len, :]
-        x_train = []
-        y_train = []
+        print(f"Fetching data from {start.date()} to {end.date()}...")
+        df = yf.download(symbol, start=start, end=end)
+    
+    if df.empty:
+        raise ValueError(f"No data available for {symbol}")
+    
+    print(f"Retrieved {len(df)} days of data")
+    print(f"Available columns: {df.columns.tolist()}")
+    
+    # Check if 'Adj Close' is available, if not use 'Close'
+    if 'Adj Close' in df.columns:
+        price_column = 'Adj Close'
+    elif 'Close' in df.columns:
+        price_column = 'Close'
+    else:
+        raise ValueError(f"No price data (Close or Adj Close) available for {symbol}")
+        
+    # Create a new float32 dataframe with only the price column, renamed to 'Close' for consistency
+    prices = df[price_column]
+    if isinstance(prices, pd.DataFrame):
+        prices = prices.iloc[:, 0]  # Single ticker column of yf.download style frames
+    data = pd.DataFrame(prices.to_numpy(dtype=np.float32, copy=True).reshape(-1, 1),
+                        index=df.index, columns=['Close'])
+    
+    if data.empty:
+        raise ValueError(f"No price data available for {symbol}")
+        
+    if len(data) < 60:
+        raise ValueError(f"Insufficient historical data for {symbol}. Need at least 60 days, got {len(data)} days.")
+    
+    # Check for and handle NaN values
+    if data['Close'].isna().any():
+        print(f"Warning: Found {data['Close'].isna().sum()} NaN values. Filling with forward fill method.")
+        data['Close'] = data['Close'].ffill()
+        if data['Close'].isna().any():
+            data['Close'] = data['Close'].bfill()
+    
+    return data
+
+def build_lstm_model(config):
+    """Build and compile the LSTM model described by a model config"""
+    model = Sequential()
+    lstm_units = config['lstm_units']
+    for i, units in enumerate(lstm_units):
+        return_sequences = i < len(lstm_units) - 1
+        if i == 0:
+            model.add(LSTM(units, return_sequences=return_sequences,
+                           input_shape=(config['sequence_length'], 1)))
+        else:
+            model.add(LSTM(units, return_sequences=return_sequences))
+        model.add(Dropout(config['dropout']))
+    model.add(Dense(config['dense_units'], activation='relu'))
+    model.add(Dense(1))
+    model.compile(optimizer='adam', loss=config['loss'])
+    return model
+
+def calculate_metrics(y_true, y_pred):
+    """Calculate the evaluation metrics reported for every model"""
+    rmse = math.sqrt(mean_squared_error(y_true, y_pred))
+    # Plain floats, so float32 inputs do not leak numpy scalars into the JSON reports
+    return {
+        'rmse': rmse,
+        'normalized_rmse': float(rmse / np.mean(y_true) * 100),
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'r2': float(r2_score(y_true, y_pred)),
+        'directional_accuracy': float(calculate_directional_accuracy(y_true, y_pred))
+    }
+
+def build_prediction_frame(data, predictions):
+    """DataFrame of actual ('Close') and predicted prices for the test period in data"""
+    return pd.DataFrame({'Close': data['Close'].to_numpy(), 'Predictions': np.ravel(predictions)},
+                        index=data.index)
+
+def prepare_training_windows(symbol, data, config, dataset_dir):
+    """Scale the prices and write them to a windowed dataset for training and testing
+
+    Returns (scaler, windowed, training_data_len). The float32 prices are
+    scaled into a single buffer that is dropped once it is written to disk.
+    """
+    prices = data['Close'].to_numpy()
+    print(f"Dataset shape: {prices.shape}")
+    
+    # Calculate training size
+    training_data_len = int(np.ceil(len(prices) * TRAIN_SPLIT))
+    print(f"Training data length: {training_data_len}")
+    
+    sequence_length = config['sequence_length']
+    if training_data_len <= sequence_length:
+        raise ValueError(f"Insufficient historical data for {symbol}. Need more than {sequence_length} training days, got {training_data_len} days.")
+    
+    # Scale the data
+    scaler = MinMaxPriceScaler()
+    scaled_data = scaler.fit_transform(prices)
+    
+    print(f"Creating sequences with length {sequence_length}...")
+    # Write the scaled prices to a memory-mapped dataset; windows are streamed from it
+    windowed = write_windowed_dataset(dataset_dir, [(symbol, scaled_data)], sequence_length)
+    del scaled_data
+    
+    return scaler, windowed, training_data_len
+
+def predict_stock_price(symbol, stock_data=None):
+    """Predict stock price using LSTM"""
+    dataset_dir = None
+    try:
+        print(f"\nProcessing predictions for {symbol}...")
         
-        sequence_length = 60
-        print(f"Creating sequences with length {sequence_length}...")
+        data = load_price_data(symbol, stock_data)
+        config = get_model_config(symbol)
         
-        for i in range(sequence_length, len(train_data)):
-            x_train.append(train_data[i-sequence_length:i, 0])
-            y_train.append(train_data[i, 0])
+        dataset_dir = tempfile.mkdtemp(prefix=f'{symbol}_windows_')
+        scaler, windowed, training_data_len = prepare_training_windows(symbol, data, config, dataset_dir)
+        sequence_length = config['sequence_length']
         
-        x_train, y_train = np.array(x_train), np.array(y_train)
-        x_train = np.reshape(x_train, (x_train.shape[0], x_train.shape[1], 1))
+        # Windows ending before training_data_len are for training, the rest for testing
+        train_windows = windowed.segment_windows(symbol, stop=training_data_len - sequence_length)
+        test_windows = windowed.segment_windows(symbol, start=training_data_len - sequence_length)
+        train_dataset = windowed.tf_dataset(config['batch_size'], train_windows, shuffle=True)
+        test_dataset = windowed.tf_dataset(config['batch_size'], test_windows, shuffle=False)
         
-        print(f"Training data shape: X={x_train.shape}, y={y_train.shape}")
+        print(f"Training windows: {len(train_windows)}, test windows: {len(test_windows)}")
         
         # Build LSTM model
         print("Building LSTM model...")
-        model = Sequential()
-        model.add(LSTM(128, return_sequences=True, input_shape=(x_train.shape[1], 1)))
-        model.add(Dropout(0.2))
-        model.add(LSTM(64, return_sequences=False))
-        model.add(Dropout(0.2))
-        model.add(Dense(32, activation='relu'))
-        model.add(Dense(1))
+        model = build_lstm_model(config)
         
         # Add early stopping
         early_stopping = EarlyStopping(
@@ -194,71 +309,48 @@ def predict_stock_price(symbol):
             restore_best_weights=True
         )
         
-        # Compile and train the model
+        # Train the model
         print("Training model...")
-        model.compile(optimizer='adam', loss='huber')
-        
         history = model.fit(
-            x_train, 
-            y_train, 
-            batch_size=32,
+            train_dataset,
             epochs=100,
             callbacks=[ProgressCallback(), early_stopping],
             verbose=0  # Disable default progress bar
         )
         
-        # Create testing dataset
-        test_data = scaled_data[training_data_len - sequence_length:, :]
-        x_test = []
-        y_test = dataset[training_data_len:, :]
-        
-        for i in range(sequence_length, len(test_data)):
-            x_test.append(test_data[i-sequence_length:i, 0])
-        
-        x_test = np.array(x_test)
-        x_test = np.reshape(x_test, (x_test.shape[0], x_test.shape[1], 1))
+        test_data = data[training_data_len:]
+        y_test = test_data['Close'].to_numpy()
         
         print("Generating predictions...")
-        # Get predictions
-        predictions = model.predict(x_test, verbose=0)
-        predictions = scaler.inverse_transform(predictions)
+        # Get predictions (float32) and scale them back to prices in place
+        predictions = model.predict(test_dataset, verbose=0).ravel()
+        scaler.inverse_transform(predictions, out=predictions)
         
         # Calculate metrics
-        rmse = math.sqrt(mean_squared_error(y_test, predictions))
-        mae = mean_absolute_error(y_test, predictions)
-        r2 = r2_score(y_test, predictions)
-        directional_accuracy = calculate_directional_accuracy(y_test, predictions)
-        
-        # Calculate normalized RMSE
-        normalized_rmse = rmse / np.mean(y_test) * 100
+        metrics = calculate_metrics(y_test, predictions)
+        metrics['final_loss'] = history.history['loss'][-1]
         
         print(f"\nPrediction metrics for {symbol}:")
-        print(f"RMSE: {rmse:.2f}")
-        print(f"Normalized RMSE: {normalized_rmse:.2f}%")
-        print(f"MAE: {mae:.2f}")
-        print(f"R² Score: {r2:.4f}")
-        print(f"Directional Accuracy: {directional_accuracy:.2f}%")
+        print(f"RMSE: {metrics['rmse']:.2f}")
+        print(f"Normalized RMSE: {metrics['normalized_rmse']:.2f}%")
+        print(f"MAE: {metrics['mae']:.2f}")
+        print(f"R² Score: {metrics['r2']:.4f}")
+        print(f"Directional Accuracy: {metrics['directional_accuracy']:.2f}%")
         
         # Create DataFrame with predictions
-        valid = data[training_data_len:].copy()
-        valid.loc[:, 'Predictions'] = predictions
-        
-        metrics = {
-            'rmse': rmse,
-            'normalized_rmse': normalized_rmse,
-            'mae': mae,
-            'r2': r2,
-            'directional_accuracy': directional_accuracy,
-            'final_loss': history.history['loss'][-1]
-        }
+        valid = build_prediction_frame(test_data, predictions)
         
         # Save prediction plot and report
         plot_path = save_prediction_plot(data, predictions, symbol)
-        save_prediction_report(metrics, symbol, data[training_data_len:], predictions)
+        save_prediction_report(metrics, symbol, test_data, predictions, config)
         
         print(f"Successfully completed predictions for {symbol}")
         return valid, metrics
         
     except Exception as e:
         print(f"Error in predict_stock_price for {symbol}: {str(e)}")
-        raise ValueError(f"Failed to process {symbol}: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Failed to process {symbol}: {str(e)}")
+    
+    finally:
+        if dataset_dir is not None:
+            shutil.rmtree(dataset_dir, ignore_errors=True)
\ No newline at end of file
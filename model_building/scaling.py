@@ -0,0 +1,56 @@
+import numpy as np
+
+
+class MinMaxPriceScaler:
+    """Min/max scaler for float32 price arrays
+
+    Same scaling as sklearn's MinMaxScaler with feature_range (0, 1), but for a
+    single price series: the fitted data_min and data_range are stored on the
+    scaler (and in to_dict), and transform / inverse_transform write into `out`
+    instead of allocating float64 copies. Pass out=values to scale in place.
+    """
+
+    def __init__(self, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.data_min = None
+        self.data_range = None
+
+    def fit(self, values):
+        values = np.asarray(values)
+        self.data_min = float(values.min())
+        self.data_range = float(values.max()) - self.data_min or 1.0
+        return self
+
+    def _output(self, values, out):
+        if self.data_min is None:
+            raise ValueError("MinMaxPriceScaler is not fitted yet")
+        if out is None:
+            out = np.empty(np.shape(values), dtype=self.dtype)
+        return out
+
+    def transform(self, values, out=None):
+        """Scale values to the fitted [0, 1] range"""
+        out = self._output(values, out)
+        np.subtract(values, self.data_min, out=out)
+        out /= self.data_range
+        return out
+
+    def fit_transform(self, values, out=None):
+        return self.fit(values).transform(values, out=out)
+
+    def inverse_transform(self, values, out=None):
+        """Map scaled values back to prices"""
+        out = self._output(values, out)
+        np.multiply(values, self.data_range, out=out)
+        out += self.data_min
+        return out
+
+    def to_dict(self):
+        return {'data_min': self.data_min, 'data_range': self.data_range}
+
+    @classmethod
+    def from_dict(cls, params, dtype=np.float32):
+        scaler = cls(dtype)
+        scaler.data_min = params['data_min']
+        scaler.data_range = params['data_range']
+        return scaler
@@ -0,0 +1,42 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.fetch_scheduler import FakeProvider
+from model_building.memory_profile import profile_symbol
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+END = datetime(2024, 6, 28)
+
+# Peak bytes allocated per day of history, on ten years of prices. The float64
+# path with sklearn's MinMaxScaler and copied frames peaked at about 56 bytes
+# per day before TensorFlow.
+MAX_BYTES_PER_DAY = {'lstm': 24, 'fast': 150}
+
+
+@pytest.fixture(scope='module')
+def stock_data():
+    return FakeProvider(latency=0).download('MEMTEST', END - timedelta(days=3650), END)
+
+
+@pytest.mark.parametrize('tier', ['lstm', 'fast'])
+def test_peak_allocations_per_symbol(stock_data, tier):
+    profile = profile_symbol('MEMTEST', stock_data, tier)
+
+    assert profile['days'] > 2500
+    assert profile['peak_bytes_per_day'] <= MAX_BYTES_PER_DAY[tier]
+
+
+def test_ingest_keeps_a_single_float32_price_column(stock_data):
+    profile = profile_symbol('MEMTEST', stock_data, 'lstm')
+
+    # One float32 price per day plus a small fixed overhead, well below the input frame
+    assert profile['ingest_peak_bytes'] <= profile['days'] * 4 + 64 * 1024
+    assert profile['ingest_peak_bytes'] < profile['input_bytes']
+
+
+def test_profiling_writes_no_report(stock_data):
+    profile_symbol('MEMTEST', stock_data, 'fast')
+
+    assert not os.path.exists(os.path.join(PROJECT_ROOT, 'results', 'MEMTEST_prediction_report.txt'))
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from model_building.scaling import MinMaxPriceScaler
+
+
+def test_transform_scales_to_unit_range_in_float32():
+    prices = np.array([10.0, 15.0, 20.0], dtype=np.float64)
+    scaled = MinMaxPriceScaler().fit_transform(prices)
+
+    assert scaled.dtype == np.float32
+    np.testing.assert_allclose(scaled, [0.0, 0.5, 1.0])
+
+
+def test_in_place_round_trip_keeps_the_buffer():
+    prices = np.array([101.5, 99.25, 110.0, 105.75], dtype=np.float32)
+    values = prices.copy()
+    scaler = MinMaxPriceScaler().fit(values)
+
+    assert scaler.transform(values, out=values) is values
+    assert scaler.inverse_transform(values, out=values) is values
+    np.testing.assert_allclose(values, prices, rtol=1e-6)
+
+
+def test_params_are_stored_and_restored():
+    scaler = MinMaxPriceScaler().fit(np.array([5.0, 25.0]))
+    restored = MinMaxPriceScaler.from_dict(scaler.to_dict())
+
+    assert scaler.to_dict() == {'data_min': 5.0, 'data_range': 20.0}
+    np.testing.assert_allclose(restored.transform(np.array([15.0])), [0.5])
+
+
+def test_constant_series_does_not_divide_by_zero():
+    scaled = MinMaxPriceScaler().fit_transform(np.full(3, 42.0))
+    np.testing.assert_allclose(scaled, 0.0)
+
+
+def test_unfitted_scaler_raises():
+    with pytest.raises(ValueError):
+        MinMaxPriceScaler().transform(np.ones(3))
@@ -0,0 +1,224 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from keras.callbacks import EarlyStopping
+
+from model_building.backtesting import RESULTS_DIR, fold_datasets
+from model_building.json_files import write_json, read_json
+from model_building.model_registry import DEFAULT_MODEL_CONFIG, register_model_config
+from model_building.model_training_and_prediction import (
+    load_price_data, build_lstm_model, calculate_metrics, PRICE_HISTORY_DAYS, TRAIN_SPLIT
+)
+
+TUNING_DIR = os.path.join(RESULTS_DIR, 'tuning')
+
+SEARCH_SPACE = {
+    'sequence_length': [30, 60, 90],
+    'lstm_units': [[64, 32], [128, 64], [256, 128]],
+    'dense_units': [16, 32, 64],
+    'dropout': [0.1, 0.2, 0.3],
+    'batch_size': [16, 32, 64]
+}
+
+
+def sample_configs(n_trials, seed=42):
+    """Sample distinct model configs from the search space; the default config is always trial 0"""
+    rng = random.Random(seed)
+    configs = [dict(DEFAULT_MODEL_CONFIG)]
+    seen = {json.dumps(configs[0], sort_keys=True)}
+    total = np.prod([len(values) for values in SEARCH_SPACE.values()])
+
+    while len(configs) < min(n_trials, total):
+        config = dict(DEFAULT_MODEL_CONFIG)
+        for name, values in SEARCH_SPACE.items():
+            config[name] = rng.choice(values)
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def prepare_datasets(prices, sequence_lengths, cache_dir):
+    """Window the training range once per sequence length and cache it on disk
+
+    Only the first TRAIN_SPLIT of the history is used (the part
+    predict_stock_price trains on); its last 20% is held out for validation, so
+    the period predictions are evaluated on never influences the search. Trials
+    with the same sequence length memory-map the same cached arrays. The cache
+    is rebuilt when the price history or the split changes.
+    """
+    train_len = int(np.ceil(len(prices) * TRAIN_SPLIT))
+    tune_len = int(np.ceil(train_len * .80))
+    # The split is part of the fingerprint, so caches built with another split are rebuilt
+    fingerprint = hashlib.sha1(prices.tobytes() + f'{tune_len}:{train_len}'.encode()).hexdigest()
+
+    for sequence_length in sequence_lengths:
+        meta_path = os.path.join(cache_dir, f'seq{sequence_length}_meta.json')
+        meta = read_json(meta_path)
+        if meta is not None and meta.get('fingerprint') == fingerprint:
+            continue
+        if tune_len <= sequence_length + 1:
+            raise ValueError(f"Insufficient historical data for sequence length {sequence_length}")
+
+        x_train, y_train, x_val, y_val, price_min, price_range = fold_datasets(
+            prices, 0, tune_len, train_len, sequence_length)
+        for name, array in (('x_train', x_train), ('y_train', y_train), ('x_val', x_val), ('y_val', y_val)):
+            np.save(os.path.join(cache_dir, f'seq{sequence_length}_{name}.npy'), array)
+        write_json(meta_path, {'price_min': price_min, 'price_range': price_range,
+                               'fingerprint': fingerprint})
+
+
+def run_trial(task):
+    """Train one trial for its rung's epoch budget and score it on the validation range"""
+    config = task['config']
+    prefix = os.path.join(task['cache_dir'], f"seq{config['sequence_length']}")
+    x_train, y_train, x_val, y_val = (np.load(f'{prefix}_{name}.npy', mmap_mode='r')
+                                      for name in ('x_train', 'y_train', 'x_val', 'y_val'))
+    meta = read_json(f'{prefix}_meta.json')
+
+    # Continue from the weights reached in the previous rung
+    model = build_lstm_model(config)
+    if os.path.exists(task['weights_path']):
+        model.load_weights(task['weights_path'])
+
+    scaled_y_val = (np.asarray(y_val) - meta['price_min']) / meta['price_range']
+    early_stopping = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    history = model.fit(
+        np.asarray(x_train),
+        np.asarray(y_train),
+        batch_size=config['batch_size'],
+        epochs=task['epochs'],
+        validation_data=(np.asarray(x_val), scaled_y_val),
+        callbacks=[early_stopping],
+        verbose=0
+    )
+    model.save_weights(task['weights_path'])
+
+    predictions = model.predict(np.asarray(x_val), verbose=0) * meta['price_range'] + meta['price_min']
+    metrics = {name: float(value) for name, value in calculate_metrics(np.asarray(y_val), predictions).items()}
+    metrics['final_loss'] = float(history.history['loss'][-1])
+    return {
+        'trial': task['trial'],
+        'config': config,
+        'epochs_trained': task['epochs_done'] + len(history.history['loss']),
+        'metrics': metrics
+    }
+
+
+def tune_model(symbol, n_trials=12, eta=3, min_epochs=5, max_epochs=45, days=PRICE_HISTORY_DAYS,
+               max_workers=None, seed=42, register=True):
+    """Successive halving search over the LSTM architecture for one symbol
+
+    All trials start with a budget of min_epochs. After each rung only the best
+    1/eta of the trials (by validation RMSE) survive, and their budget is
+    multiplied by eta, until one trial is left or max_epochs is reached. Trials
+    of a rung are trained in parallel. The winning config is written to the
+    model registry together with the history it was tuned on.
+    """
+    print(f"\nTuning LSTM architecture for {symbol} ({n_trials} trials, eta={eta})...")
+    tuning_dir = os.path.join(TUNING_DIR, symbol)
+    cache_dir = os.path.join(tuning_dir, 'datasets')
+    os.makedirs(cache_dir, exist_ok=True)
+
+    if days != PRICE_HISTORY_DAYS:
+        print(f"Warning: tuning on {days} days of history, predictions use {PRICE_HISTORY_DAYS} days")
+    data = load_price_data(symbol, days=days)
+    prices = data['Close'].to_numpy()
+
+    configs = sample_configs(n_trials, seed)
+    prepare_datasets(prices, sorted({config['sequence_length'] for config in configs}), cache_dir)
+
+    survivors = [{'trial': i, 'config': config, 'epochs_trained': 0} for i, config in enumerate(configs)]
+    for i in range(len(configs)):
+        # Weights from an earlier tuning run must not leak into this one
+        weights_path = os.path.join(tuning_dir, f'trial{i}.weights.h5')
+        if os.path.exists(weights_path):
+            os.remove(weights_path)
+
+    max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+    context = multiprocessing.get_context('spawn')
+    rungs = []
+    budget = min_epochs
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        while True:
+            print(f"\nRung {len(rungs) + 1}: {len(survivors)} trials, {budget} epochs each")
+            futures = {}
+            for trial in survivors:
+                task = {
+                    'trial': trial['trial'],
+                    'config': trial['config'],
+                    'cache_dir': cache_dir,
+                    'weights_path': os.path.join(tuning_dir, f"trial{trial['trial']}.weights.h5"),
+                    'epochs': budget - trial['epochs_trained'],
+                    'epochs_done': trial['epochs_trained']
+                }
+                futures[executor.submit(run_trial, task)] = trial
+
+            results = []
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                    results.append(result)
+                    print(f"Trial {result['trial']}: val RMSE {result['metrics']['rmse']:.2f} "
+                          f"{result['config']}")
+                except Exception as e:
+                    print(f"Error in trial {futures[future]['trial']}: {str(e)}")
+
+            if not results:
+                raise ValueError(f"All tuning trials failed for {symbol}")
+
+            results.sort(key=lambda result: result['metrics']['rmse'])
+            rungs.append({'budget': budget, 'results': results})
+
+            if len(results) == 1 or budget >= max_epochs:
+                break
+            survivors = results[:max(1, len(results) // eta)]
+            budget = min(budget * eta, max_epochs)
+
+    best = rungs[-1]['results'][0]
+    summary = {'symbol': symbol, 'history_days': days, 'train_split': TRAIN_SPLIT, 'best': best, 'rungs': rungs}
+    write_json(os.path.join(tuning_dir, 'tuning_results.json'), summary)
+
+    print(f"\nBest config for {symbol}: {best['config']}")
+    print(f"Validation RMSE: {best['metrics']['rmse']:.2f}, "
+          f"Directional Accuracy: {best['metrics']['directional_accuracy']:.2f}%")
+
+    if register:
+        register_model_config(symbol, best['config'], best['metrics'],
+                              tuning={'history_days': days, 'train_split': TRAIN_SPLIT})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Successive halving search over the LSTM architecture')
+    parser.add_argument('symbols', nargs='+', help='Stock symbols to tune')
+    parser.add_argument('--trials', type=int, default=12, help='Number of sampled configs')
+    parser.add_argument('--eta', type=int, default=3, help='Keep 1/eta of the trials after each rung')
+    parser.add_argument('--min-epochs', type=int, default=5, help='Epoch budget of the first rung')
+    parser.add_argument('--max-epochs', type=int, default=45, help='Maximum epoch budget per trial')
+    parser.add_argument('--days', type=int, default=PRICE_HISTORY_DAYS,
+                        help='Days of history to download (default: the prediction history)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-register', action='store_true', help='Do not update the model registry')
+    args = parser.parse_args()
+
+    for symbol in args.symbols:
+        try:
+            tune_model(symbol, n_trials=args.trials, eta=args.eta, min_epochs=args.min_epochs,
+                       max_epochs=args.max_epochs, days=args.days, max_workers=args.workers,
+                       seed=args.seed, register=not args.no_register)
+        except Exception as e:
+            print(f"Error tuning {symbol}: {str(e)}")
+
+
+if __name__ == '__main__':
+    main()
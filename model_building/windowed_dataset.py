@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+PRICES_FILE = 'prices.f32'
+WINDOWS_FILE = 'windows.i64'
+META_FILE = 'meta.json'
+
+
+def write_windowed_dataset(dataset_dir, series, sequence_length):
+    """Write price series to an on-disk windowed dataset
+
+    series is an iterable of (name, 1-D array of scaled prices). Prices are
+    appended to one float32 file and the start offset of every window to an
+    int64 window index, one series at a time, so memory use does not grow with
+    the number of series. Windows never cross from one series into the next.
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    segments = []
+    offset = 0
+    n_windows = 0
+
+    with open(os.path.join(dataset_dir, PRICES_FILE), 'wb') as prices_file, \
+            open(os.path.join(dataset_dir, WINDOWS_FILE), 'wb') as windows_file:
+        for name, prices in series:
+            prices = np.asarray(prices, dtype=np.float32).ravel()
+            prices.tofile(prices_file)
+
+            # A window starting at s uses prices[s:s + sequence_length] to predict prices[s + sequence_length]
+            count = max(len(prices) - sequence_length, 0)
+            np.arange(offset, offset + count, dtype=np.int64).tofile(windows_file)
+
+            segments.append({
+                'name': name,
+                'start': offset,
+                'end': offset + len(prices),
+                'first_window': n_windows,
+                'n_windows': count
+            })
+            offset += len(prices)
+            n_windows += count
+
+    with open(os.path.join(dataset_dir, META_FILE), 'w') as f:
+        json.dump({
+            'sequence_length': sequence_length,
+            'n_prices': offset,
+            'n_windows': n_windows,
+            'segments': segments
+        }, f, indent=2)
+
+    return WindowedDataset(dataset_dir)
+
+
+class WindowedDataset:
+    """Memory-mapped windowed dataset streamed into Keras through tf.data
+
+    Only the window index is shuffled; the windows themselves are gathered from
+    the memory-mapped price file batch by batch, in parallel with training.
+    """
+
+    def __init__(self, dataset_dir):
+        with open(os.path.join(dataset_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.sequence_length = self.meta['sequence_length']
+        self.prices = np.memmap(os.path.join(dataset_dir, PRICES_FILE), dtype=np.float32, mode='r',
+                                shape=(self.meta['n_prices'],))
+        self.windows = np.memmap(os.path.join(dataset_dir, WINDOWS_FILE), dtype=np.int64, mode='r',
+                                 shape=(self.meta['n_windows'],))
+
+    def __len__(self):
+        return self.meta['n_windows']
+
+    def segment_windows(self, name, start=None, stop=None):
+        """Window index of one series, optionally limited to windows [start, stop) of that series"""
+        segment = next(s for s in self.meta['segments'] if s['name'] == name)
+        first = segment['first_window']
+        return self.windows[first:first + segment['n_windows']][start:stop]
+
+    def _gather(self, starts):
+        offsets = starts[:, np.newaxis] + np.arange(self.sequence_length + 1)
+        batch = self.prices[offsets]
+        return batch[:, :-1, np.newaxis], batch[:, -1]
+
+    def tf_dataset(self, batch_size=32, window_index=None, shuffle=True, seed=None):
+        """Stream (x, y) batches of the given windows (all windows by default)"""
+        window_index = np.asarray(self.windows if window_index is None else window_index)
+        dataset = tf.data.Dataset.from_tensor_slices(window_index)
+        if shuffle:
+            dataset = dataset.shuffle(len(window_index), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.batch(batch_size)
+
+        def gather(starts):
+            x, y = tf.numpy_function(self._gather, [starts], [tf.float32, tf.float32])
+            x.set_shape([None, self.sequence_length, 1])
+            y.set_shape([None])
+            return x, y
+
+        dataset = dataset.map(gather, num_parallel_calls=tf.data.AUTOTUNE)
+        return dataset.prefetch(tf.data.AUTOTUNE)